@@ -1,304 +1,374 @@
+import logging
+import re
 import streamlit as st
-import pandas as pd
-from PIL import Image
-import plotly.express as px # Import plotly for charting
-import plotly.graph_objects as go # Import graph objects for more control if needed
-
-# Load data
-@st.cache_data
-def load_data():
-    # Assuming Data_2025.xlsx is in the same directory as app.py
-    url = "Data_2025.xlsx"
-    return pd.read_excel(url, sheet_name="data", engine='openpyxl')
-
-df = load_data()
-
-# Resolve potential column naming issues for robustness
-def get_column_safe(df, name_options):
-    for name in name_options:
-        if name in df.columns:
-            return name
-    return None
-
-unit_name_col = get_column_safe(df, ["Unit name", "Unit Name"])
-region_col = get_column_safe(df, ["Region"])
-year_col = get_column_safe(df, ["Year"])
-quarter_col = get_column_safe(df, ["Quarter"])
-recovery_col = get_column_safe(df, ["Recovery type", "Recovery Type", "Recovery_type"])
-size_col = get_column_safe(df, ["Unit size", "Unit Size"])
-brand_col = get_column_safe(df, ["Brand name", "Brand"])
-logo_col = get_column_safe(df, ["Brand logo", "Brand Logo"])
-unit_photo_col = get_column_safe(df, ["Unit photo", "Unit Photo", "Unit Photo Name"]) # Added common names for unit photo column
-internal_height_col = get_column_safe(df, ["Internal Height (Supply Fan)", "Internal Height Supply Fan"]) # Added for specific chart placement check
-
-# --- Chart specific column names ---
-# Store resolved X and Y coordinate column names as pairs
-coord_col_pairs = []
-for i in range(1, 6): # For X1, Y1 to X5, Y5
-    # Add more options for column names if there are variations in your Excel file
-    x_col_name = get_column_safe(df, [f"X{i}", f"x{i}", f"X{i}_coord", f"x{i}_coord"])
-    y_col_name = get_column_safe(df, [f"Y{i}", f"y{i}", f"Y{i}_coord", f"y{i}_coord"])
-    if x_col_name and y_col_name: # Only add if both X and Y for a point are found
-        coord_col_pairs.append((x_col_name, y_col_name))
-    else:
-        # Provide a warning if expected coordinate columns are not found in the DataFrame
-        # This helps in debugging missing columns in the Excel file
-        if not x_col_name:
-            st.sidebar.warning(f"Warning: Coordinate column 'X{i}' not found in data. Chart may be incomplete.")
-        if not y_col_name:
-            st.sidebar.warning(f"Warning: Coordinate column 'Y{i}' not found in data. Chart may be incomplete.")
-
+import dataset_store # Period workbooks loaded per Year/Quarter on demand, following updates on disk
+import image_service # Decoded/resized image bytes cached across reruns
+import comparison # Vectorized comparison table styling
+import figure_cache # Built geometry charts reused across reruns
+import instrumentation # Per-stage timing spans for the admin panel
+
+# Show the partition vs. workbook load timings in the server log
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+# Period workbooks (Data_2024.xlsx, Data_2025.xlsx, ...) in the same directory as app.py
+DATA_PATTERN = "Data_*.xlsx"
+
+# Seconds between checks of the workbooks' mtime and size
+WATCH_INTERVAL = 5.0
+# Memory for loaded periods; least recently used periods are unloaded beyond it
+PERIOD_MEMORY_MB = 512
+
+IMAGES_DIR = "images"
+LOGO_WIDTH = 150 # Desired fixed width of brand logos in pixels
+PHOTO_COLUMN_WIDTH = 400 # Approximate width of one comparison column; unit photos are served at the smallest variant that fits
+
+# Streamlit runs every session in its own thread, so the objects from the st.cache_resource
+# functions below are shared across threads; each of them guards its state with a lock
+
+# One image cache shared by all sessions; logos and unit photos are decoded once per file version and width.
+# Pre-built web variants (python build_image_variants.py) are used when their manifest exists
+@st.cache_resource
+def get_image_service():
+    manifest = image_service.ImageManifest(f"{IMAGES_DIR}/variants/manifest.json")
+    return image_service.ImageService(max_entries=64, manifest=manifest)
+
+# Geometry figures shared by all sessions, keyed by the selected rows and chart options
+@st.cache_resource
+def get_figure_cache():
+    return figure_cache.FigureCache(max_entries=128)
+
+# Stage timings aggregated across all sessions. Collection is off unless AHU_PROFILING=1
+# or it is switched on in the admin panel (open the app with ?admin=1)
+@st.cache_resource
+def get_profiler():
+    return instrumentation.Profiler()
+
+# Options passed to the geometry chart; part of the figure cache key
+chart_options = (("markers", True), ("hovermode", "x unified"))
+
+def migrate_figures(figures, old_engine, new_engine, diff):
+    # Keep cached figures whose rows did not change across a workbook update, re-keyed to the new version
+    if diff is None: # Columns changed: old figures simply age out of the cache
+        return
+    old_to_new = diff.old_to_new(len(old_engine.df))
+    touched_families = {key[:-1] for key in diff.touched}
+
+    def translate(key):
+        if key[0] != old_engine.version: # Another period's engine (or already re-keyed): keep it as is
+            return key
+        if key[1] == "overlay": # (version, "overlay", labels, family prefixes)
+            return None if touched_families.intersection(key[3]) else (new_engine.version,) + key[1:]
+        positions = old_to_new[list(key[1])] # (version, row positions, labels, chart options)
+        return None if (positions < 0).any() else (new_engine.version, tuple(positions.tolist())) + key[2:]
+
+    figures.migrate(translate)
+
+# One store per server shared by all sessions. Workbooks are split into Year/Quarter partitions once per
+# version; an engine is loaded only for the periods a selection uses. When a workbook changes, only the
+# changed rows are patched into the loaded engines and they are swapped between reruns
+@st.cache_resource
+def get_dataset_store():
+    figures = get_figure_cache()
+    store = dataset_store.DatasetStore.from_pattern(
+        DATA_PATTERN, memory_budget_mb=PERIOD_MEMORY_MB, poll_seconds=WATCH_INTERVAL,
+        on_swap=lambda old, new, diff: migrate_figures(figures, old, new, diff))
+    return store.start()
+
+profiler = get_profiler()
+rerun_started = profiler.start()
+
+with profiler.span("load"):
+    store = get_dataset_store()
+    # Everything this rerun shows comes from one generation of the store, even if the
+    # watcher reloads a workbook while the page is being drawn
+    view = store.view()
+
+# Tell the session when a workbook changed since its previous rerun
+if st.session_state.get("data_generation") not in (None, view.generation):
+    st.toast(f"Workbook updated ({view.last_change}).")
+st.session_state["data_generation"] = view.generation
+
+# Number of units compared side by side; the user can add or remove comparison columns
+MIN_UNITS = 2
+MAX_UNITS = 8
+if "unit_count" not in st.session_state:
+    st.session_state["unit_count"] = MIN_UNITS
+
+# Widget key prefixes of the seven dropdowns of a side, in selection key order (year1, quarter1, ...)
+SELECTION_WIDGETS = ("year", "quarter", "region", "brand", "unit", "recovery", "size")
+# Column headers for selection keys shown in tables and messages, in the same order
+SELECTION_LABELS = ("Year", "Quarter", "Region", "Brand", "Unit name", "Recovery type", "Unit size")
+
+def use_selection(n, key):
+    # Button callback: put a full selection key into side n's dropdowns before the next rerun draws them
+    for prefix, value in zip(SELECTION_WIDGETS, key):
+        st.session_state[f"{prefix}{n}"] = value
+
+def compare_units(keys):
+    # Button callback: show the given selection keys side by side, one per comparison column
+    keys = list(keys)[:MAX_UNITS]
+    st.session_state["unit_count"] = max(MIN_UNITS, len(keys))
+    for n, key in enumerate(keys, start=1):
+        use_selection(n, key)
+
+# Permalinks: the URL carries every side's selection (?u1=2025|Q1|CER|VTS|...&u2=...). An opened link
+# fills all dropdowns before they are drawn, so the comparison resolves and renders in a single run
+PERMALINK_SEPARATOR = "|"
+link = {name: value for name, value in st.query_params.items() if re.fullmatch(r"u\d+", name)}
+link_warnings = [] # Shown under the title
+if link and link != st.session_state.get("permalink"):
+    with profiler.span("permalink"):
+        linked_sides = sorted(int(name[1:]) for name in link if 1 <= int(name[1:]) <= MAX_UNITS)
+        st.session_state["unit_count"] = max(MIN_UNITS, linked_sides[-1]) if linked_sides else MIN_UNITS
+        for n in linked_sides:
+            values = link[f"u{n}"].split(PERMALINK_SEPARATOR)
+            key = view.match_key(values) # Text from the URL back to the dropdowns' values
+            use_selection(n, key)
+            for prefix in SELECTION_WIDGETS[len(key):]:
+                st.session_state.pop(f"{prefix}{n}", None) # Unmatched levels fall back to the first option
+            if len(key) < len(SELECTION_WIDGETS):
+                value = values[len(key)] if len(key) < len(values) else ""
+                link_warnings.append(f"Link for unit {n}: no {SELECTION_LABELS[len(key)]} '{value}'"
+                                     f"{' under ' + ' / '.join(map(str, key)) if key else ''}; the first available option is shown.")
+    st.session_state["permalink"] = link
 
 # Main layout filters for the comparison interface
 st.title("Technical Data Comparison")
-
-# Create two columns for side-by-side selection and display
-col_filter1, col_filter2 = st.columns(2)
-
-with col_filter1:
-    # Dropdown menus for the first comparison set
-    selected_year1 = st.selectbox("Year", sorted(df[year_col].dropna().unique()), key="year1")
-    selected_quarter1 = st.selectbox("Quarter", sorted(df[quarter_col].dropna().unique()), key="quarter1")
-    selected_region1 = st.selectbox("Region", sorted(df[region_col].dropna().unique()), key="region1")
-    selected_brand1 = st.selectbox("Select Brand", sorted(df[brand_col].dropna().unique()), key="brand1")
-
-    # Display Brand Logo for the first selection
-    # Filter the DataFrame to get the logo path for the selected brand
-    brand1_logo_path = df[df[brand_col] == selected_brand1][logo_col].iloc[0] if not df[df[brand_col] == selected_brand1].empty and logo_col else None
-    if brand1_logo_path:
-        try:
-            # Open and resize the image, maintaining aspect ratio
-            image1 = Image.open(f"images/{brand1_logo_path}")
-            width1 = 150 # Desired fixed width in pixels
-            height1 = int(image1.height * (width1 / image1.width)) # Calculate height to maintain aspect ratio
-            image1 = image1.resize((width1, height1))
-            st.image(image1, caption=f"Logo for {selected_brand1}") # Display the image with a caption
-        except FileNotFoundError:
-            st.warning(f"Brand logo image not found for {selected_brand1}: images/{brand1_logo_path}")
-        except Exception as e:
-            st.warning(f"Error loading brand logo for {selected_brand1}: {e}")
+for message in link_warnings:
+    st.warning(message)
+
+col_add, col_remove, _ = st.columns([1, 1, 4])
+with col_add:
+    if st.button("Add unit", disabled=st.session_state["unit_count"] >= MAX_UNITS):
+        st.session_state["unit_count"] += 1
+with col_remove:
+    if st.button("Remove unit", disabled=st.session_state["unit_count"] <= MIN_UNITS):
+        st.session_state["unit_count"] -= 1
+
+# Duty-point search: every unit whose Minimum..Maximum airflow covers the required airflow,
+# answered by the engine's interval tree (built once per period) instead of a scan per query
+with st.expander("Find units by required airflow"):
+    periods = view.periods()
+    col_period, col_airflow, col_region, col_recovery = st.columns(4)
+    with col_period:
+        duty_period = st.selectbox("Period", periods, index=len(periods) - 1, key="duty_period",
+                                   format_func=lambda period: f"{period[0]} {period[1]}")
+    with profiler.span("period_load"):
+        duty_engine = view.engine([duty_period])
+    with col_airflow:
+        duty_airflow = st.number_input("Required airflow [m³/h]", min_value=0, value=1000, step=100, key="duty_airflow")
+    with col_region:
+        duty_region = st.selectbox("Region", [None] + duty_engine.catalog.values(duty_engine.columns.region),
+                                   format_func=lambda value: "Any" if value is None else value, key="duty_region")
+    with col_recovery:
+        duty_recovery = st.selectbox("Recovery type", [None] + duty_engine.catalog.values(duty_engine.columns.recovery),
+                                     format_func=lambda value: "Any" if value is None else value, key="duty_recovery")
+    with profiler.span("duty_point"):
+        covering = duty_engine.covering_airflow(duty_airflow, duty_region, duty_recovery)
+    if covering:
+        st.caption(f"{len(covering)} units cover {duty_airflow} m³/h, smallest maximum airflow first. "
+                   f"Select up to {MAX_UNITS} rows to compare them.")
+        duty_results = st.dataframe(
+            [dict(zip(SELECTION_LABELS[2:], key[2:]),
+                  **{"Minimum airflow [m³/h]": low, "Maximum airflow [m³/h]": high}) for key, low, high in covering],
+            hide_index=True, on_select="rerun", selection_mode="multi-row", key="duty_results")
+        duty_selected = [covering[i][0] for i in duty_results.selection.rows]
+        st.button("Compare selected", disabled=not duty_selected, on_click=compare_units, args=(duty_selected,))
     else:
-        st.write("No logo available for selected brand.")
-
-    # Continue with other dropdowns for the first comparison set
-    selected_unit1 = st.selectbox("Unit name", sorted(df[unit_name_col].dropna().unique()), key="unit1")
-    selected_recovery1 = st.selectbox("Recovery type", sorted(df[recovery_col].dropna().unique()), key="recovery1")
-    selected_size1 = st.selectbox("Unit size", sorted(df[size_col].dropna().unique()), key="size1")
-
-
-with col_filter2:
-    # Dropdown menus for the second comparison set
-    selected_year2 = st.selectbox("Year", sorted(df[year_col].dropna().unique()), key="year2")
-    selected_quarter2 = st.selectbox("Quarter", sorted(df[quarter_col].dropna().unique()), key="quarter2")
-    selected_region2 = st.selectbox("Region", sorted(df[region_col].dropna().unique()), key="region2")
-    selected_brand2 = st.selectbox("Select Brand", sorted(df[brand_col].dropna().unique()), key="brand2")
-
-    # Display Brand Logo for the second selection
-    brand2_logo_path = df[df[brand_col] == selected_brand2][logo_col].iloc[0] if not df[df[brand_col] == selected_brand2].empty and logo_col else None
-    if brand2_logo_path:
-        try:
-            image2 = Image.open(f"images/{brand2_logo_path}")
-            width2 = 150 # Desired fixed width in pixels
-            height2 = int(image2.height * (width2 / image2.width)) # Calculate height to maintain aspect ratio
-            image2 = image2.resize((width2, height2))
-            st.image(image2, caption=f"Logo for {selected_brand2}")
-        except FileNotFoundError:
-            st.warning(f"Brand logo image not found for {selected_brand2}: images/{brand2_logo_path}")
-        except Exception as e:
-            st.warning(f"Error loading brand logo for {selected_brand2}: {e}")
-    else:
-        st.write("No logo available for selected brand.")
-
-    # Continue with other dropdowns for the second comparison set
-    selected_unit2 = st.selectbox("Unit name", sorted(df[unit_name_col].dropna().unique()), key="unit2")
-    selected_recovery2 = st.selectbox("Recovery type", sorted(df[recovery_col].dropna().unique()), key="recovery2")
-    selected_size2 = st.selectbox("Unit size", sorted(df[size_col].dropna().unique()), key="size2")
-
-# Filter dataframes based on selected criteria for both comparison sets
-filtered_df1 = df[
-    (df[year_col] == selected_year1) &
-    (df[quarter_col] == selected_quarter1) &
-    (df[region_col] == selected_region1) &
-    (df[brand_col] == selected_brand1) &
-    (df[unit_name_col] == selected_unit1) &
-    (df[recovery_col] == selected_recovery1) &
-    (df[size_col] == selected_size1)
-]
-
-filtered_df2 = df[
-    (df[year_col] == selected_year2) &
-    (df[quarter_col] == selected_quarter2) &
-    (df[region_col] == selected_region2) &
-    (df[brand_col] == selected_brand2) &
-    (df[unit_name_col] == selected_unit2) &
-    (df[recovery_col] == selected_recovery2) &
-    (df[size_col] == selected_size2)
-]
+        st.info("No unit covers this airflow with the chosen filters.")
+
+unit_count = st.session_state["unit_count"]
+sides = range(1, unit_count + 1) # Widget keys keep the 1-based suffix (year1, year2, ...)
+
+# Create one column per compared unit for side-by-side selection and display
+filter_columns = st.columns(unit_count)
+selections = [] # Seven-value key per side, in filter column order
+
+filters_started = profiler.start()
+for n, col_filter in zip(sides, filter_columns):
+    with col_filter:
+        # Dropdown menus for this comparison set
+        # Each dropdown only lists values that exist for the choices made above it
+        # Year and Quarter come from the store's partition list; the period's rows are loaded
+        # (or taken from the store's cache) only once both are chosen
+        selected_year = st.selectbox("Year", view.years(), key=f"year{n}")
+        selected_quarter = st.selectbox("Quarter", view.quarters(selected_year), key=f"quarter{n}")
+        with profiler.span("period_load"):
+            engine = view.engine([(selected_year, selected_quarter)])
+        selected_region = st.selectbox("Region", engine.options((selected_year, selected_quarter)), key=f"region{n}")
+        selected_brand = st.selectbox("Select Brand", engine.options((selected_year, selected_quarter, selected_region)), key=f"brand{n}")
+
+        # Display Brand Logo for this selection
+        # The logo path for the selected brand comes from the engine's cached dimension catalog
+        brand_logo_path = engine.logo_for(selected_brand)
+        if brand_logo_path:
+            try:
+                # Get the logo resized to a fixed width (aspect ratio kept) from the image cache
+                with profiler.span("logo_image"):
+                    logo_image = get_image_service().get_fitted(IMAGES_DIR, brand_logo_path, LOGO_WIDTH, exact=True)
+                st.image(logo_image, caption=f"Logo for {selected_brand}") # Display the image with a caption
+            except FileNotFoundError:
+                st.warning(f"Brand logo image not found for {selected_brand}: images/{brand_logo_path}")
+            except Exception as e:
+                st.warning(f"Error loading brand logo for {selected_brand}: {e}")
+        else:
+            st.write("No logo available for selected brand.")
+
+        # Continue with other dropdowns for this comparison set
+        selected_unit = st.selectbox("Unit name", engine.options((selected_year, selected_quarter, selected_region, selected_brand)), key=f"unit{n}")
+        selected_recovery = st.selectbox("Recovery type", engine.options((selected_year, selected_quarter, selected_region, selected_brand, selected_unit)), key=f"recovery{n}")
+        selected_size = st.selectbox("Unit size", engine.options((selected_year, selected_quarter, selected_region, selected_brand, selected_unit, selected_recovery)), key=f"size{n}")
+
+        selections.append((selected_year, selected_quarter, selected_region, selected_brand,
+                           selected_unit, selected_recovery, selected_size))
+profiler.stop("filters", filters_started) # Dropdowns and logos of every side
+
+# Keep the URL in step with the dropdowns, so the address bar is always a permalink to this comparison
+current_link = {f"u{n}": PERMALINK_SEPARATOR.join(str(value) for value in key) for n, key in zip(sides, selections)}
+if current_link != link:
+    for name in set(link) - set(current_link):
+        del st.query_params[name]
+    st.query_params.update(current_link)
+st.session_state["permalink"] = current_link
+
+# Resolve all selections against the prebuilt index of their period (one row per side, in side
+# order), instead of a mask scan per side. Sides of different periods each use their period's engine.
+# Labels are unique so two units of the same brand stay separate in the chart and table
+with profiler.span("resolve"):
+    engine = view.engine([key[:2] for key in selections]) # The sides' own engine when they share a period
+    data_version = engine.version
+    resolved = engine.resolve(selections)
+
+# Provide a warning if expected coordinate columns are not found in the DataFrame
+# This helps in debugging missing columns in the Excel file
+for missing_col in engine.columns.missing_coord_cols:
+    st.sidebar.warning(f"Warning: Coordinate column '{missing_col}' not found in data. Chart may be incomplete.")
+selected_units = [key[4] for key in selections]
 
 # Display Unit Photos after dropdowns and before the comparison table
 st.subheader("Unit Photo")
-col_photo1, col_photo2 = st.columns(2) # Create columns for side-by-side unit photos
-
-with col_photo1:
-    # Get the unit photo path for the first selection
-    unit_photo_path1 = filtered_df1[unit_photo_col].values[0] if not filtered_df1.empty and unit_photo_col and unit_photo_col in filtered_df1.columns else None
-    if unit_photo_path1:
-        try:
-            # Open and display the unit photo
-            unit_image1 = Image.open(f"images/{unit_photo_path1}")
-            st.image(unit_image1, caption=f"{selected_unit1} Photo")
-        except FileNotFoundError:
-            st.warning(f"Unit photo image not found for {selected_unit1}: images/{unit_photo_path1}")
-        except Exception as e:
-            st.warning(f"Error loading unit photo for {selected_unit1}: {e}")
-    else:
-        st.write("No unit photo available for this selection.")
-
-with col_photo2:
-    # Get the unit photo path for the second selection
-    unit_photo_path2 = filtered_df2[unit_photo_col].values[0] if not filtered_df2.empty and unit_photo_col and unit_photo_col in filtered_df2.columns else None
-    if unit_photo_path2:
-        try:
-            # Open and display the unit photo
-            unit_image2 = Image.open(f"images/{unit_photo_path2}")
-            st.image(unit_image2, caption=f"{selected_unit2} Photo")
-        except FileNotFoundError:
-            st.warning(f"Unit photo image not found for {selected_unit2}: images/{unit_photo_path2}")
-        except Exception as e:
-            st.warning(f"Error loading unit photo for {selected_unit2}: {e}")
-    else:
-        st.write("No unit photo available for this selection.")
+photo_columns = st.columns(unit_count) # Create columns for side-by-side unit photos
+
+for unit_photo_path, selected_unit, col_photo in zip(engine.unit_photo(resolved), selected_units, photo_columns):
+    with col_photo:
+        if unit_photo_path:
+            try:
+                # Display the smallest cached variant of the unit photo that fits the column
+                with profiler.span("unit_photo"):
+                    unit_image = get_image_service().get_fitted(IMAGES_DIR, unit_photo_path, PHOTO_COLUMN_WIDTH)
+                st.image(unit_image, caption=f"{selected_unit} Photo")
+            except FileNotFoundError:
+                st.warning(f"Unit photo image not found for {selected_unit}: images/{unit_photo_path}")
+            except Exception as e:
+                st.warning(f"Error loading unit photo for {selected_unit}: {e}")
+        else:
+            st.write("No unit photo available for this selection.")
 
 st.markdown("---") # Add a horizontal separator line for better visual separation
 
 # Chart Generation Logic (moved outside the parameter loop for consistent placement)
-if not filtered_df1.empty and not filtered_df2.empty:
-    chart_data = []
-    
-    # Check if all 5 coordinate pairs were found during initial column resolution
-    if len(coord_col_pairs) != 5:
+if resolved.complete:
+    # Check if the 5 outline coordinate pairs were found during initial column resolution
+    if engine.columns.missing_coord_cols:
         st.warning("Not all 5 coordinate pairs (X1-X5, Y1-Y5) were identified in the data. Chart may not display correctly.")
 
-    # Check if coordinate columns exist and have non-NaN values for each brand
-    can_plot_brand1 = True
-    if not filtered_df1.empty: # Ensure filtered_df1 is not empty before checking
-        for x_name, y_name in coord_col_pairs:
-            if x_name not in filtered_df1.columns or pd.isna(filtered_df1[x_name].values[0]) or \
-               y_name not in filtered_df1.columns or pd.isna(filtered_df1[y_name].values[0]):
-                can_plot_brand1 = False
-                st.info(f"Incomplete coordinate data for {selected_brand1}. Chart may not include this brand.")
-                break # Exit loop if any coordinate is missing/NaN
-    else:
-        can_plot_brand1 = False # No data for filtered_df1
-
-    can_plot_brand2 = True
-    if not filtered_df2.empty: # Ensure filtered_df2 is not empty before checking
-        for x_name, y_name in coord_col_pairs:
-            if x_name not in filtered_df2.columns or pd.isna(filtered_df2[x_name].values[0]) or \
-               y_name not in filtered_df2.columns or pd.isna(filtered_df2[y_name].values[0]):
-                can_plot_brand2 = False
-                st.info(f"Incomplete coordinate data for {selected_brand2}. Chart may not include this brand.")
-                break # Exit loop if any coordinate is missing/NaN
-    else:
-        can_plot_brand2 = False # No data for filtered_df2
-
-
-    # Process data for the first selection if all coordinates are present and not NaN
-    if can_plot_brand1:
-        for i, (x_name, y_name) in enumerate(coord_col_pairs):
-            chart_data.append({
-                'X_coord': filtered_df1[x_name].values[0] / 20.0,
-                'Y_coord': filtered_df1[y_name].values[0] / 20.0,
-                'Source': selected_brand1,
-                'Point_Order': i + 1 # Point order 1 to 5
-            })
-    
-
-    # Process data for the second selection if all coordinates are present and not NaN
-    if can_plot_brand2:
-        for i, (x_name, y_name) in enumerate(coord_col_pairs):
-            chart_data.append({
-                'X_coord': filtered_df2[x_name].values[0] / 20.0,
-                'Y_coord': filtered_df2[y_name].values[0] / 20.0,
-                'Source': selected_brand2,
-                'Point_Order': i + 1 # Point order 1 to 5
-            })
-    
-
-    if chart_data: # Only attempt to plot if some data is gathered
+    # Outlines (points 1-15) come pre-scaled from the engine's geometry table, so the chart data is a slice of it;
+    # missing points are gaps that break the polygon instead of dropping the unit
+    plotted_labels, skipped_labels = engine.drawable_labels(resolved)
+    for label in skipped_labels:
+        st.info(f"Incomplete coordinate data for {label}. Chart may not include this brand.")
+
+    if plotted_labels: # Only attempt to plot if some data is gathered
         st.subheader("Unit Geometry Comparison") # New subheader for the chart
-        chart_df = pd.DataFrame(chart_data)
-
-        # Sort by Point_Order to ensure lines are drawn correctly for rectangles
-        chart_df = chart_df.sort_values(by=['Source', 'Point_Order'])
-        
-        # Create the Plotly chart
-        fig = px.line(chart_df,
-                      x="X_coord",
-                      y="Y_coord",
-                      color="Source",
-                      line_group="Source", # Group lines by source
-                      markers=True, # Show markers at data points
-                      title="Scaled Rectangle Dimensions (1:20 mm)")
-        
-        # Update layout for better visualization
-        fig.update_layout(
-            xaxis_title="X Coordinate (mm)",
-            yaxis_title="Y Coordinate (mm)",
-            hovermode="x unified",
-            legend_title_text="Brand",
-            xaxis_constrain="domain", # Keeps aspect ratio better
-            yaxis_constrain="domain", # Keeps aspect ratio better
-            showlegend=True
-        )
-        
-        # Ensure the aspect ratio is equal if it's a drawing
-        fig.update_yaxes(scaleanchor="x", scaleratio=1)
-
-        st.plotly_chart(fig, use_container_width=True)
-    else: # If chart_data is empty after checks
-        st.warning("No complete coordinate data (X1-X5, Y1-Y5) found for selected units to generate the geometry chart. Please ensure data is present and valid for both selections.")
+        overlay_sizes = st.checkbox("Overlay all sizes of each selected unit family", key="overlay_sizes")
+
+        if overlay_sizes:
+            # Every Unit size under each selection's year/quarter/region/brand/unit/recovery,
+            # drawn as one WebGL trace per selection with gaps between the outlines
+            figure_key = (data_version, "overlay", tuple(resolved.labels), tuple(key[:-1] for key in selections))
+            with profiler.span("figure"):
+                fig = get_figure_cache().get(figure_key, lambda: engine.overlay_figure(resolved))
+        else:
+            # Reuse the figure when the same rows, labels and options were charted before
+            # (e.g. reruns caused by unrelated widgets); otherwise build and cache it
+            figure_key = (data_version, tuple(resolved.positions.tolist()), tuple(resolved.labels), chart_options)
+            with profiler.span("figure"):
+                fig = get_figure_cache().get(figure_key, lambda: engine.footprint_figure(resolved, **dict(chart_options)))
+
+        with profiler.span("chart_render"):
+            st.plotly_chart(fig, use_container_width=True)
+    else: # If no unit has enough coordinate data
+        st.warning("No coordinate data (X1-X15, Y1-Y15) found for selected units to generate the geometry chart. Please ensure data is present and valid for the selections.")
 
 
     # Now, display the comparison table
     st.subheader("Comparison Table") # Main header for the comparison table
 
-    # Define columns for the table header
-    col1, col2, col3 = st.columns([2, 3, 3]) # Adjust column widths as needed
-    with col1:
-        st.markdown("**Parameter**") # Header for the parameter column
-    with col2:
-        st.markdown(f"**{selected_brand1}**") # Header for the first brand's values
-    with col3:
-        st.markdown(f"**{selected_brand2}**") # Header for the second brand's values
-
-    # List of columns to be excluded from the comparison table display as per user request
-    excluded_cols = [
-        brand_col, logo_col, unit_photo_col, year_col, quarter_col, region_col,
-        unit_name_col, recovery_col, size_col, internal_height_col # Exclude chart placement column
-    ]
-    # Add all resolved coordinate column names to the excluded list
-    for x_name, y_name in coord_col_pairs:
-        excluded_cols.append(x_name)
-        excluded_cols.append(y_name)
-
-
-    # Iterate through all columns in the original DataFrame to display comparison values
-    for col in df.columns:
-        # Only display columns that are not in the excluded list
-        if col not in excluded_cols:
-            # Get values for each column for both filtered dataframes
-            val1 = filtered_df1[col].values[0] if col in filtered_df1.columns else "-"
-            val2 = filtered_df2[col].values[0] if col in filtered_df2.columns else "-" 
-            
-            # Create columns for each row of the comparison table
-            row_col1, row_col2, row_col3 = st.columns([2, 3, 3])
-            with row_col1:
-                st.write(col) # Display the parameter name
-            with row_col2:
-                st.write(val1) # Display the value for the first brand
-            with row_col3:
-                st.write(val2) # Display the value for the second brand
+    # Optionally annotate numeric parameters with their difference to the first unit, coloured by
+    # whether higher or lower is better (from the engine's parameter schema)
+    show_differences = st.checkbox("Show differences against the first unit", key="show_differences")
+
+    # Build the whole Parameter x brand table at once from the selected rows (selection keys, images
+    # and coordinate columns excluded) and render it as a single element, with differing values highlighted
+    # and units next to the parameter names
+    with profiler.span("table"):
+        comparison_table = engine.comparison_table(resolved)
+        differences = engine.differences(resolved) if show_differences else None
+        st.table(comparison.style_comparison(
+            comparison_table, differences,
+            directions=engine.parameters.directions(engine.parameters.numeric),
+            row_labels=engine.parameters.labels(comparison_table.index)))
+
+    # Nearest units of other brands by normalized technical parameters (k-d tree built once per engine)
+    st.subheader("Equivalent Competitor Units")
+    reference_side = st.selectbox("Find units of other brands similar to", range(unit_count),
+                                  format_func=lambda i: f"Unit {i + 1}: {resolved.labels[i]} {selections[i][6]}",
+                                  key="equivalent_reference")
+    match_count = st.slider("Number of matches", 1, 10, 5, key="equivalent_count")
+    # Searched among the units of the reference unit's own period
+    reference_engine = view.engine([selections[reference_side][:2]])
+    with profiler.span("equivalents"):
+        matches = reference_engine.equivalents(selections[reference_side], match_count)
+    if matches:
+        st.caption("Compared on: " + ", ".join(reference_engine.parameters.labels(reference_engine.similarity.features))
+                   + ". Distance is in standard deviations across all units.")
+        st.dataframe(
+            [dict(zip(SELECTION_LABELS, key),
+                  Distance=round(distance, 3)) for key, distance in matches],
+            hide_index=True)
+        col_match, col_target, col_use = st.columns([3, 2, 1], vertical_alignment="bottom")
+        with col_match:
+            match_choice = st.selectbox("Match", range(len(matches)), key="equivalent_match",
+                                        format_func=lambda i: " / ".join(str(v) for v in matches[i][0][3:]))
+        with col_target:
+            target_side = st.selectbox("Show in", [i for i in range(unit_count) if i != reference_side],
+                                       format_func=lambda i: f"Unit {i + 1}", key="equivalent_target")
+        with col_use:
+            st.button("Compare", on_click=use_selection, args=(target_side + 1, matches[match_choice][0]))
+    else:
+        st.info("No units of other brands with comparable parameters were found.")
 else:
     # Display a warning if data is missing for comparison
     st.warning("One of the selected combinations has no data to display for comparison. Please adjust your selections.")
+
+profiler.stop("rerun", rerun_started) # Whole script run, excluding the admin panel below
+
+# Hidden admin panel (?admin=1): switch timing collection on/off, view p50/p95 per stage
+# across all sessions together with the image and figure cache counters, and export them
+if st.query_params.get("admin") == "1":
+    with st.sidebar:
+        st.header("Performance")
+        profiler.enabled = st.toggle("Collect stage timings", value=profiler.enabled,
+                                     help="Shared by all sessions; adds a timer around each stage when on")
+        stage_summary = profiler.summary()
+        if stage_summary:
+            st.dataframe([dict(stage=name, **stats) for name, stats in stage_summary.items()], hide_index=True)
+        else:
+            st.caption("No timings collected yet.")
+        cache_stats = {"image_cache": get_image_service().stats(), "figure_cache": get_figure_cache().stats(),
+                       "dataset_store": store.stats()}
+        st.json(cache_stats, expanded=False)
+        st.download_button("Export JSON", profiler.to_json(cache_stats), file_name="stage_timings.json", mime="application/json")
+        st.download_button("Export Prometheus", profiler.to_prometheus(), file_name="stage_timings.prom", mime="text/plain")
+        if st.button("Reset timings"):
+            profiler.reset()
@@ -0,0 +1,237 @@
+import argparse
+import io
+import logging
+import math
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+from openpyxl.drawing.image import Image as SheetImage
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+
+import comparison
+import data_cache
+import dataset_store
+import image_service
+
+logger = logging.getLogger(__name__)
+
+# Fields of one unit in a pair list, in selection key order. CSV headers add the side
+# number like the app's widget keys: year1, quarter1, ..., size1, year2, ...
+KEY_FIELDS = ("year", "quarter", "region", "brand", "unit", "recovery", "size")
+PHOTO_WIDTH = 300 # Unit photos are embedded at this width in pixels
+ROW_PIXELS = 20 # Height of a default worksheet row, for placing content under images
+
+# Set in each worker process by _init_worker
+_store = None
+_images = None
+_images_dir = None
+
+
+def read_pairs(path):
+    # Comparison jobs from a CSV or YAML file as [(name, [seven raw values per unit])].
+    # CSV: one row per comparison with year1..size1, year2..size2 (more sides allowed) and
+    # an optional name column. YAML: a list of {name, units}, each unit a seven-value list
+    # or a mapping with the KEY_FIELDS names
+    if path.lower().endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise RuntimeError("Reading YAML pair lists needs PyYAML (pip install pyyaml)")
+        with open(path, "r", encoding="utf-8") as fh:
+            entries = yaml.safe_load(fh) or []
+        jobs = []
+        for entry in entries:
+            units = [[unit.get(field) for field in KEY_FIELDS] if isinstance(unit, dict) else list(unit)
+                     for unit in entry.get("units", [])]
+            jobs.append((entry.get("name"), units))
+        return jobs
+
+    rows = pd.read_csv(path, dtype=str, keep_default_na=False)
+    sides = sorted({int(match.group(1)) for col in rows.columns
+                    for match in [re.fullmatch(rf"(?:{'|'.join(KEY_FIELDS)})(\d+)", col)] if match})
+    jobs = []
+    for row in rows.to_dict("records"):
+        units = [[row.get(f"{field}{n}", "") for field in KEY_FIELDS] for n in sides]
+        # Sides left blank in a row (e.g. a 2-unit row in a 3-unit file) are skipped
+        units = [unit for unit in units if any(str(value).strip() for value in unit)]
+        jobs.append((row.get("name") or None, units))
+    return jobs
+
+
+def _init_worker(pattern, cache_dir, images_dir):
+    # Each worker opens the store once (partitions are already on disk) and keeps its own image cache
+    global _store, _images, _images_dir
+    _store = dataset_store.DatasetStore.from_pattern(pattern, cache_dir=cache_dir)
+    _images = image_service.ImageService(max_entries=32)
+    _images_dir = images_dir
+
+
+def _photo(name, width):
+    if not name or not width:
+        return None
+    try:
+        return _images.get(os.path.join(_images_dir, name), width)
+    except (OSError, ValueError) as e:
+        logger.warning("Unit photo %s not embedded: %s", name, e)
+        return None
+
+
+def render_pair(job, photo_width=PHOTO_WIDTH):
+    # Runs in a worker process: everything one report sheet needs, as picklable values.
+    # The same engine calls as the app: resolve, comparison table, differences and outlines
+    index, name, units = job
+    view = _store.view() # One store generation for the whole sheet
+    keys = [view.match_key(values) for values in units]
+    result = {"index": index, "name": name, "units": units, "error": None}
+    for values, key in zip(units, keys):
+        if len(key) < len(KEY_FIELDS):
+            level = KEY_FIELDS[len(key)]
+            value = values[len(key)] if len(key) < len(values) else ""
+            result["error"] = f"No {level} '{value}' under {' / '.join(map(str, key)) or 'the loaded periods'}"
+            return result
+    if len(keys) < 2:
+        result["error"] = "A comparison needs at least two units"
+        return result
+
+    engine = view.engine([key[:2] for key in keys])
+    resolved = engine.resolve(keys)
+    table = engine.comparison_table(resolved)
+    points, plotted, skipped = engine.chart_frame(resolved)
+    result.update(
+        name=name or " vs ".join(f"{key[3]} {key[6]}" for key in keys),
+        keys=keys,
+        labels=resolved.labels,
+        table=table,
+        differences=engine.differences(resolved),
+        directions=engine.parameters.directions(engine.parameters.numeric),
+        row_labels=engine.parameters.labels(table.index),
+        points=points,
+        plotted=plotted,
+        skipped=skipped,
+        footprint=engine.footprint_image(resolved) if plotted else None,
+        photos=[_photo(photo, photo_width) for photo in engine.unit_photo(resolved)],
+    )
+    return result
+
+
+def _sheet_name(name, used):
+    # Excel sheet names: at most 31 characters, none of []:*?/\ and unique in the workbook
+    base = re.sub(r"[\[\]:*?/\\]", "-", str(name)).strip("' ")[:31] or "Comparison"
+    sheet = base
+    count = 1
+    while sheet.lower() in used:
+        count += 1
+        suffix = f" ({count})"
+        sheet = base[:31 - len(suffix)] + suffix
+    used.add(sheet.lower())
+    return sheet
+
+
+def _wide_points(points, labels):
+    # Long-form chart data -> one X and one Y column per unit, one row per outline point
+    wide = pd.DataFrame({"Point": sorted(points["Point_Order"].unique())})
+    for label in labels:
+        outline = points[points["Source"] == label].set_index("Point_Order")
+        wide[f"X {label}"] = outline["X_coord"].reindex(wide["Point"]).to_numpy()
+        wide[f"Y {label}"] = outline["Y_coord"].reindex(wide["Point"]).to_numpy()
+    return wide
+
+
+def _write_sheet(writer, sheet, result):
+    # Parameter table on the left (styled as in the app), outline points and the footprint
+    # image to its right, unit photos below them
+    styled = comparison.style_comparison(result["table"], result["differences"], result["directions"],
+                                         result["row_labels"])
+    styled.to_excel(writer, sheet_name=sheet, startrow=1)
+    ws = writer.sheets[sheet]
+    ws.cell(row=1, column=1, value=result["name"]).font = Font(bold=True, size=14)
+    ws.column_dimensions["A"].width = 45
+    for col in range(2, len(result["labels"]) + 2):
+        ws.column_dimensions[get_column_letter(col)].width = 22
+
+    chart_col = len(result["labels"]) + 3 # One empty column after the table
+    image_rows = points_rows = 0
+    if result["plotted"]:
+        wide = _wide_points(result["points"], result["plotted"])
+        wide.to_excel(writer, sheet_name=sheet, startrow=1, startcol=chart_col - 1, index=False)
+        points_rows = len(wide) + 2 # Below the title row and the header
+        # The footprint chart as a static image (footprint_render), right of the points
+        image = SheetImage(io.BytesIO(result["footprint"]))
+        ws.add_image(image, f"{get_column_letter(chart_col + 2 * len(result['plotted']) + 2)}2")
+        image_rows = math.ceil(image.height / ROW_PIXELS)
+    note_row = max(image_rows, points_rows) + 2
+    for label in result["skipped"]:
+        ws.cell(row=note_row, column=chart_col, value=f"Incomplete coordinate data for {label}; not drawn.")
+        note_row += 1
+
+    # Photos side by side under the footprint
+    photo_row = note_row + 2
+    photo_col = chart_col
+    for label, data in zip(result["labels"], result["photos"]):
+        if data is None:
+            continue
+        image = SheetImage(io.BytesIO(data))
+        ws.cell(row=photo_row - 1, column=photo_col, value=label).font = Font(bold=True)
+        ws.add_image(image, f"{get_column_letter(photo_col)}{photo_row}")
+        photo_col += max(1, round(image.width / 64)) + 1 # Default columns are about 64 px wide
+
+
+def write_workbook(results, path):
+    # One sheet per comparison plus a Summary sheet listing every job and its status
+    used = {"summary"}
+    summary = []
+    tmp_path = path + ".tmp.xlsx"
+    with pd.ExcelWriter(tmp_path, engine="openpyxl") as writer:
+        pd.DataFrame().to_excel(writer, sheet_name="Summary") # First sheet; filled in below
+        for result in results:
+            units = [" / ".join(map(str, key)) for key in result.get("keys", result["units"])]
+            if result["error"]:
+                summary.append({"#": result["index"] + 1, "Sheet": "", "Units": "\n".join(units), "Status": result["error"]})
+                continue
+            sheet = _sheet_name(result["name"], used)
+            _write_sheet(writer, sheet, result)
+            summary.append({"#": result["index"] + 1, "Sheet": sheet, "Units": "\n".join(units), "Status": "OK"})
+        pd.DataFrame(summary, columns=["#", "Sheet", "Units", "Status"]).to_excel(writer, sheet_name="Summary", index=False)
+        ws = writer.sheets["Summary"]
+        for col, width in zip("ABCD", (5, 32, 90, 60)):
+            ws.column_dimensions[col].width = width
+    os.replace(tmp_path, path) # Never leave a half-written report behind
+    return summary
+
+
+def build_reports(pairs_path, out_path, pattern=dataset_store.DEFAULT_PATTERN, cache_dir=data_cache.DEFAULT_CACHE_DIR,
+                  images_dir="images", workers=None, photo_width=PHOTO_WIDTH):
+    # Render every comparison of the pair list in parallel and write them to one workbook
+    jobs = [(index, name, units) for index, (name, units) in enumerate(read_pairs(pairs_path))]
+    # Partition the workbooks once up front, so the workers only read Parquet files
+    dataset_store.DatasetStore.from_pattern(pattern, cache_dir=cache_dir)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(pattern, cache_dir, images_dir)) as pool:
+        chunksize = max(1, len(jobs) // ((workers or os.cpu_count() or 1) * 4))
+        results = list(pool.map(render_pair, jobs, [photo_width] * len(jobs), chunksize=chunksize))
+    return write_workbook(results, out_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write comparison reports for a list of unit pairs to one workbook.")
+    parser.add_argument("pairs", help="CSV (year1..size1, year2..size2, optional name) or YAML pair list")
+    parser.add_argument("-o", "--output", default="comparison_reports.xlsx")
+    parser.add_argument("--pattern", default=dataset_store.DEFAULT_PATTERN, help="Period workbooks to compare from")
+    parser.add_argument("--cache-dir", default=data_cache.DEFAULT_CACHE_DIR)
+    parser.add_argument("--images-dir", default="images")
+    parser.add_argument("--photo-width", type=int, default=PHOTO_WIDTH, help="Embedded photo width in pixels (0: no photos)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s")
+    start = time.perf_counter()
+    summary = build_reports(args.pairs, args.output, args.pattern, args.cache_dir, args.images_dir,
+                            args.workers, args.photo_width)
+    failed = [entry for entry in summary if entry["Status"] != "OK"]
+    print(f"Wrote {args.output}: {len(summary) - len(failed)} comparisons in {time.perf_counter() - start:.2f} s")
+    for entry in failed:
+        print(f"  #{entry['#']}: {entry['Status']}")
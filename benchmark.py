@@ -0,0 +1,180 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+import comparison
+import comparison_engine
+import data_cache
+import synthetic_catalog
+
+DEFAULT_WORKBOOK = "Data_2025.xlsx"
+DEFAULT_BASELINE = os.path.join(".benchmarks", "baseline.json")
+
+
+def time_calls(fn, repeat):
+    # Wall time of `repeat` calls in ms
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000.0)
+    return timings
+
+
+def peak_memory_mb(fn):
+    # Peak Python allocation while running fn once (measured separately from timing)
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    finally:
+        tracemalloc.stop()
+
+
+def summarize(timings):
+    ordered = sorted(timings)
+    return {
+        "median_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))], 3),
+        "min_ms": round(ordered[0], 3),
+        "runs": len(ordered),
+    }
+
+
+def scaled_frame(df, row_factor=1, col_factor=1, seed=0):
+    # Synthetic catalogue with row_factor x the rows of the source (profiled from it
+    # by synthetic_catalog) and its technical parameters repeated col_factor times
+    schema = synthetic_catalog.CatalogSchema.from_frame(df)
+    return synthetic_catalog.generate(schema, len(df) * row_factor, column_factor=col_factor, seed=seed)
+
+
+def run_workbook(path, label, repeat, cache_dir):
+    # Time every hot path of one page render against one workbook
+    results = {"workbook": os.path.basename(path), "label": label, "stages": {}}
+    stages = results["stages"]
+
+    # Cold load: openpyxl parse plus snapshot write (a few runs only, it is slow)
+    cold_runs = max(1, min(3, repeat))
+    stages["cold_load"] = summarize(time_calls(lambda: data_cache.build_snapshot(path, "data", cache_dir), cold_runs))
+    stages["cold_load"]["peak_mb"] = round(peak_memory_mb(lambda: data_cache.build_snapshot(path, "data", cache_dir)), 2)
+    stages["snapshot_load"] = summarize(time_calls(lambda: data_cache.load_sheet(path, "data", cache_dir), repeat))
+    stages["snapshot_load"]["peak_mb"] = round(peak_memory_mb(lambda: data_cache.load_sheet(path, "data", cache_dir)), 2)
+
+    df = data_cache.load_sheet(path, "data", cache_dir)
+    results["rows"], results["columns"] = int(len(df)), int(len(df.columns))
+    stages["engine_build"] = summarize(time_calls(lambda: comparison_engine.ComparisonEngine(df), max(1, min(5, repeat))))
+    stages["engine_build"]["peak_mb"] = round(peak_memory_mb(lambda: comparison_engine.ComparisonEngine(df)), 2)
+    engine = comparison_engine.ComparisonEngine(df)
+
+    # Two sides: the first and the last valid combination in dropdown order
+    keys = sorted(engine.selection_index.keys(), key=lambda key: tuple(str(value) for value in key))
+    selections = [keys[0], keys[-1]]
+
+    def options():
+        # What the dropdowns ask for on a rerun: 7 levels for each side
+        for key in selections:
+            for depth in range(len(key)):
+                engine.options(key[:depth])
+
+    resolved = engine.resolve(selections)
+
+    def diff():
+        comparison.style_comparison(engine.comparison_table(resolved), engine.differences(resolved),
+                                    engine.parameters.directions(engine.parameters.numeric))
+
+    def chart():
+        engine.footprint_figure(resolved).to_json()
+
+    def rerun():
+        options()
+        current = engine.resolve(selections)
+        engine.unit_photo(current)
+        comparison.style_comparison(engine.comparison_table(current))
+        engine.chart_frame(current)
+
+    # Duty point: the first side's maximum airflow, so the query has matches
+    max_airflow = engine.columns.max_airflow
+    airflow = pd.to_numeric(resolved.rows[max_airflow], errors="coerce").iloc[0] if max_airflow else 0.0
+
+    for name, fn in (("options", options), ("select", lambda: engine.resolve(selections)),
+                     ("duty_point", lambda: engine.covering_airflow(airflow)), ("diff", diff), ("chart_prep", chart), ("rerun", rerun)):
+        stages[name] = summarize(time_calls(fn, repeat))
+        stages[name]["peak_mb"] = round(peak_memory_mb(fn), 2)
+    return results
+
+
+def compare(current, baseline, threshold=0.10, min_delta_ms=0.5):
+    # Print median changes against a saved baseline; returns the number of regressions.
+    # Sub-millisecond stages are noisy, so a slowdown must also exceed min_delta_ms
+    previous = {(run["label"], name): stage for run in baseline["runs"] for name, stage in run["stages"].items()}
+    regressions = 0
+    for run in current["runs"]:
+        for name, stage in run["stages"].items():
+            before = previous.get((run["label"], name))
+            if not before or not before["median_ms"]:
+                continue
+            change = (stage["median_ms"] - before["median_ms"]) / before["median_ms"]
+            flag = ""
+            if change > threshold and stage["median_ms"] - before["median_ms"] > min_delta_ms:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"{run['label']:>16} {name:<14} {before['median_ms']:>10.3f} -> {stage['median_ms']:>10.3f} ms ({change:+.1%}){flag}")
+    return regressions
+
+
+def print_results(results):
+    for run in results["runs"]:
+        print(f"\n{run['label']}: {run['rows']} rows x {run['columns']} columns")
+        print(f"  {'stage':<14} {'median ms':>10} {'p95 ms':>10} {'peak MB':>9}")
+        for name, stage in run["stages"].items():
+            print(f"  {name:<14} {stage['median_ms']:>10.3f} {stage['p95_ms']:>10.3f} {stage['peak_mb']:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark load, filter, diff and render-prep hot paths.")
+    parser.add_argument("workbook", nargs="?", default=DEFAULT_WORKBOOK)
+    parser.add_argument("--row-scales", type=int, nargs="+", default=[1, 10, 100],
+                        help="Synthetic row multipliers of the workbook (1 = the real file)")
+    parser.add_argument("--col-scales", type=int, nargs="+", default=[1],
+                        help="Synthetic column multipliers of the technical parameters")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--save", metavar="PATH", help="Save results as a baseline JSON file")
+    parser.add_argument("--compare", metavar="PATH", nargs="?", const=DEFAULT_BASELINE,
+                        help=f"Compare against a saved baseline (default {DEFAULT_BASELINE})")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Median slowdown reported as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="Ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    source = pd.read_excel(args.workbook, sheet_name="data", engine="openpyxl")
+    results = {"created": time.time(), "python": platform.python_version(), "pandas": pd.__version__, "runs": []}
+    with tempfile.TemporaryDirectory() as workdir:
+        cache_dir = os.path.join(workdir, "cache")
+        for row_factor in args.row_scales:
+            for col_factor in args.col_scales:
+                label = f"rows{row_factor}x-cols{col_factor}x"
+                if row_factor == 1 and col_factor == 1:
+                    path = args.workbook
+                else:
+                    # Synthetic workbooks are written once to a temp folder and loaded like the real one
+                    path = os.path.join(workdir, f"{label}.xlsx")
+                    scaled_frame(source, row_factor, col_factor).to_excel(path, sheet_name="data", index=False)
+                results["runs"].append(run_workbook(path, label, args.repeat, cache_dir))
+
+    print_results(results)
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as fh:
+            print(f"\nCompared with {args.compare}:")
+            if compare(results, json.load(fh), args.threshold, args.min_delta_ms):
+                raise SystemExit(1)
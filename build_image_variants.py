@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+# Widths cover the 150 px brand logos up to full-width unit photos
+DEFAULT_WIDTHS = (150, 300, 600, 1200)
+DEFAULT_FORMATS = ("webp", "png")
+VARIANTS_DIRNAME = "variants"
+MANIFEST_NAME = "manifest.json"
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".gif")
+
+
+def _variant_widths(original_width, widths):
+    # Never upscale: keep the requested widths below the original, plus the original width itself
+    return sorted({w for w in widths if w < original_width} | {original_width})
+
+
+def build_variants(source_path, out_dir, widths=DEFAULT_WIDTHS, formats=DEFAULT_FORMATS):
+    # Runs in a worker process: decode the source once, write every width/format
+    name = os.path.basename(source_path)
+    stem = os.path.splitext(name)[0]
+    variants = []
+    with Image.open(source_path) as image:
+        image.load()
+        original_width, original_height = image.size
+        for width in _variant_widths(original_width, widths):
+            height = max(1, round(original_height * width / original_width)) # Maintain aspect ratio
+            resized = image if width == original_width else image.resize((width, height), Image.LANCZOS)
+            for fmt in formats:
+                filename = f"{stem}.{width}.{fmt}"
+                target = os.path.join(out_dir, filename)
+                if fmt == "webp":
+                    resized.save(target, format="WEBP", quality=85, method=6)
+                else:
+                    resized.save(target, format="PNG", optimize=True)
+                variants.append({
+                    "width": width,
+                    "height": height,
+                    "format": fmt,
+                    "path": f"{VARIANTS_DIRNAME}/{filename}",
+                    "bytes": os.path.getsize(target),
+                })
+    return name, {
+        "mtime_ns": os.stat(source_path).st_mtime_ns,
+        "width": original_width,
+        "height": original_height,
+        "bytes": os.path.getsize(source_path),
+        "variants": variants,
+    }
+
+
+def build_all(images_dir="images", widths=DEFAULT_WIDTHS, formats=DEFAULT_FORMATS, workers=None):
+    # Walk images_dir, build variants for every image in parallel and write the manifest.
+    # Manifest keys are the file names used in the "Brand logo" / "Unit photo" columns
+    out_dir = os.path.join(images_dir, VARIANTS_DIRNAME)
+    os.makedirs(out_dir, exist_ok=True)
+    sources = sorted(
+        os.path.join(images_dir, name) for name in os.listdir(images_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(os.path.join(images_dir, name))
+    )
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(build_variants, path, out_dir, tuple(widths), tuple(formats)) for path in sources]
+        images = dict(future.result() for future in futures)
+
+    manifest = {"generated_at": time.time(), "widths": list(widths), "formats": list(formats), "images": images}
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2)
+    os.replace(tmp_path, manifest_path) # Readers never see a half-written manifest
+    return manifest_path, manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create downscaled WebP/PNG variants of the app images.")
+    parser.add_argument("images_dir", nargs="?", default="images")
+    parser.add_argument("--widths", type=int, nargs="+", default=list(DEFAULT_WIDTHS))
+    parser.add_argument("--formats", nargs="+", default=list(DEFAULT_FORMATS), choices=["webp", "png"])
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    path, result = build_all(args.images_dir, args.widths, args.formats, args.workers)
+    total_in = sum(entry["bytes"] for entry in result["images"].values())
+    print(f"Wrote {path}: {len(result['images'])} images, "
+          f"{sum(len(entry['variants']) for entry in result['images'].values())} variants "
+          f"from {total_in / 1024:.0f} KB of sources in {time.perf_counter() - start:.2f} s")
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+
+# Background used to highlight parameters whose values differ between the selected units
+DIFF_HIGHLIGHT_CSS = "background-color: #fff3cd"
+# Text colour of a difference that is better or worse than the first unit, by the parameter's direction
+BETTER_CSS = "color: #1a7f37"
+WORSE_CSS = "color: #cf222e"
+FLAG_LABELS = {True: "YES", False: "NO"}
+
+
+def unique_labels(labels):
+    # Column headers must be unique for the table and its styling;
+    # repeated brand names get a counter, e.g. "VTS", "VTS (2)"
+    seen = {}
+    result = []
+    for label in labels:
+        label = str(label)
+        seen[label] = seen.get(label, 0) + 1
+        result.append(label if seen[label] == 1 else f"{label} ({seen[label]})")
+    return result
+
+
+def build_comparison_frame(rows, labels, excluded_cols=()):
+    # Turn the selected rows (one per compared unit, in display order) into a
+    # Parameter x unit table in one step: select the displayed columns and transpose
+    excluded = {col for col in excluded_cols if col is not None}
+    params = [col for col in rows.columns if col not in excluded]
+    rows = rows[params]
+    # YES/NO flags are stored as booleans (dtype_schema); show them as in the workbook
+    flags = [col for col in params if pd.api.types.is_bool_dtype(rows[col])]
+    if flags:
+        rows = rows.assign(**{col: rows[col].map(FLAG_LABELS).astype(object) for col in flags})
+    table = rows.T
+    table.columns = unique_labels(labels)
+    table.index.name = "Parameter"
+    return table
+
+
+def differing_parameters(table):
+    # Boolean Series: True where not all units share the same value (NaN counts as a value)
+    return table.nunique(axis=1, dropna=False) > 1
+
+
+def parameter_differences(rows, params, labels, reference=0):
+    # Absolute and relative differences of the numeric parameters against the reference
+    # unit, computed on one (units x parameters) float matrix. Returns (absolute, relative)
+    # Parameter x unit frames; relative is NaN where the reference value is 0 or missing
+    values = rows[params].to_numpy(dtype=float, na_value=np.nan)
+    base = values[reference]
+    absolute = values - base
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relative = np.where(base != 0, absolute / np.abs(base), np.nan)
+    index = pd.Index(params, name="Parameter")
+    columns = unique_labels(labels)
+    return pd.DataFrame(absolute.T, index=index, columns=columns), pd.DataFrame(relative.T, index=index, columns=columns)
+
+
+def signed_fixed(values):
+    # "+28400", "+12.5", "-0.75": fixed-point text with fewer decimals for larger magnitudes
+    # (never scientific notation) and without trailing zeros
+    values = np.asarray(values, dtype=float)
+    magnitude = np.abs(values)
+    text = np.where(magnitude >= 100, np.char.mod("%+.0f", values),
+                    np.where(magnitude >= 10, np.char.mod("%+.1f", values),
+                             np.where(magnitude >= 0.01, np.char.mod("%+.2f", values), np.char.mod("%+.4f", values))))
+    stripped = np.char.rstrip(np.char.rstrip(text, "0"), ".")
+    return np.where(np.char.find(text, ".") >= 0, stripped, text)
+
+
+def style_comparison(table, differences=None, directions=None, row_labels=None):
+    # Values are shown as text ("-" when missing) so mixed numbers/text render
+    # consistently; differing rows are highlighted with one vectorized CSS frame.
+    # With differences (from parameter_differences), changed numeric cells also show
+    # "(+200, +14.3%)" and are coloured by directions (+1: higher is better, -1: lower
+    # is better, 0: neither). row_labels replaces the parameter names (e.g. with units)
+    differs = differing_parameters(table).to_numpy()
+    display = table.astype(object).where(table.notna(), "-").astype(str)
+    css = np.where(np.broadcast_to(differs[:, None], display.shape), DIFF_HIGHLIGHT_CSS, "").astype(object)
+    values = display.to_numpy()
+
+    if differences is not None:
+        absolute, relative = (frame.to_numpy() for frame in differences)
+        rows = display.index.get_indexer(differences[0].index)
+        shown = ~np.isnan(absolute) & (absolute != 0)
+        suffix = np.char.add(np.char.add(" (", signed_fixed(absolute)),
+                             np.where(np.isnan(relative), ")", np.char.mod(", %+.1f%%)", relative * 100)))
+        values[rows] = np.where(shown, np.char.add(values[rows].astype(str), suffix), values[rows])
+        if directions is not None:
+            better = np.sign(absolute) * np.asarray(directions)[:, None]
+            colour = np.where(shown & (better > 0), BETTER_CSS, np.where(shown & (better < 0), WORSE_CSS, ""))
+            css[rows] = np.where(colour != "", np.char.add(np.char.add(css[rows].astype(str), "; "), colour), css[rows])
+
+    index = pd.Index(row_labels if row_labels is not None else display.index, name=display.index.name)
+    display = pd.DataFrame(values, index=index, columns=display.columns)
+    css = pd.DataFrame(css, index=index, columns=display.columns)
+    return display.style.apply(lambda _: css, axis=None)
@@ -0,0 +1,463 @@
+"""Headless comparison engine used by the Streamlit page and by batch tools.
+
+Everything here is plain Python/pandas: load the workbook, resolve column
+names, build the selection index, dropdown options and geometry table, resolve
+a list of selections and produce the comparison table and chart data. Nothing
+imports Streamlit, so the hot paths can be timed or reused outside a browser.
+"""
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, FrozenSet, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+import comparison
+import data_cache
+import dtype_schema
+import filter_engine
+import footprint_render
+import geometry
+import parameter_schema
+import similarity
+
+# Alternative spellings accepted for each logical column
+COLUMN_NAME_OPTIONS = {
+    "unit_name": ["Unit name", "Unit Name"],
+    "region": ["Region"],
+    "year": ["Year"],
+    "quarter": ["Quarter"],
+    "recovery": ["Recovery type", "Recovery Type", "Recovery_type"],
+    "size": ["Unit size", "Unit Size"],
+    "brand": ["Brand name", "Brand"],
+    "logo": ["Brand logo", "Brand Logo"],
+    "unit_photo": ["Unit photo", "Unit Photo", "Unit Photo Name"],
+    "internal_height": ["Internal Height (Supply Fan)", "Internal Height Supply Fan"],
+    # Airflow range of a unit; "(min)"/"(max)" when dtype_schema split range cells
+    "min_airflow": ["Minimum airflow", "Minimum airflow (min)"],
+    "max_airflow": ["Maximum airflow", "Maximum airflow (max)"],
+}
+
+
+def get_column_safe(df: pd.DataFrame, name_options: Sequence[str]) -> Optional[str]:
+    # First of the candidate names that exists in the frame
+    for name in name_options:
+        if name in df.columns:
+            return name
+    return None
+
+
+@dataclass(frozen=True)
+class ColumnMap:
+    """Resolved column names of the loaded sheet (None when a column is absent)."""
+
+    unit_name: Optional[str]
+    region: Optional[str]
+    year: Optional[str]
+    quarter: Optional[str]
+    recovery: Optional[str]
+    size: Optional[str]
+    brand: Optional[str]
+    logo: Optional[str]
+    unit_photo: Optional[str]
+    internal_height: Optional[str]
+    min_airflow: Optional[str]
+    max_airflow: Optional[str]
+    coord_col_pairs: Tuple[Tuple[str, str], ...] = ()
+    # Outline points 1-5 whose X or Y column is missing, e.g. ("X3", "Y3")
+    missing_coord_cols: Tuple[str, ...] = ()
+
+    @classmethod
+    def resolve(cls, df: pd.DataFrame) -> "ColumnMap":
+        names = {key: get_column_safe(df, options) for key, options in COLUMN_NAME_OPTIONS.items()}
+        pairs = []
+        missing = []
+        for i in range(1, geometry.MAX_POINTS + 1): # For X1, Y1 to X15, Y15
+            x_col_name = get_column_safe(df, [f"X{i}", f"x{i}", f"X{i}_coord", f"x{i}_coord"])
+            y_col_name = get_column_safe(df, [f"Y{i}", f"y{i}", f"Y{i}_coord", f"y{i}_coord"])
+            if x_col_name and y_col_name: # Only add if both X and Y for a point are found
+                pairs.append((x_col_name, y_col_name))
+            elif i <= 5: # Points 6-15 are only used by multi-section units and are optional
+                missing.extend(f"{axis}{i}" for axis, name in (("X", x_col_name), ("Y", y_col_name)) if not name)
+        return cls(coord_col_pairs=tuple(pairs), missing_coord_cols=tuple(missing), **names)
+
+    @property
+    def key_cols(self) -> Tuple[Optional[str], ...]:
+        # Filter columns in dropdown order (year -> quarter -> region -> brand -> unit -> recovery -> size)
+        return (self.year, self.quarter, self.region, self.brand, self.unit_name, self.recovery, self.size)
+
+    @property
+    def excluded_cols(self) -> List[Optional[str]]:
+        # Columns not shown in the comparison table: selection keys, images, chart placement and coordinates
+        excluded = [
+            self.brand, self.logo, self.unit_photo, self.year, self.quarter, self.region,
+            self.unit_name, self.recovery, self.size, self.internal_height,
+        ]
+        for x_name, y_name in self.coord_col_pairs:
+            excluded.extend((x_name, y_name))
+        return excluded
+
+
+# A full selection: (year, quarter, region, brand, unit name, recovery type, unit size)
+SelectionKey = Tuple[Any, ...]
+
+
+@dataclass
+class ResolvedSelection:
+    """Result of resolving several selections against the index."""
+
+    keys: List[SelectionKey]
+    positions: np.ndarray # Row position of each matched key, in key order
+    found: List[bool]
+    rows: pd.DataFrame # One row per matched key, in key order
+    labels: List[str] = field(default_factory=list) # Unique display label per key (brand based)
+
+    @property
+    def complete(self) -> bool:
+        return bool(self.found) and all(self.found)
+
+
+@dataclass
+class RowDiff:
+    """Row-level difference between two versions of the sheet with the same columns."""
+
+    new_to_old: np.ndarray # Per new row: position of the same row in the old frame, -1 if added
+    changed: np.ndarray # New positions of matched rows whose values differ
+    removed: np.ndarray # Old positions with no matching row in the new frame
+    changed_columns: Tuple[str, ...] # Columns with at least one changed value
+    touched: FrozenSet[SelectionKey] # Selection keys of every added, removed or changed row
+
+    @property
+    def added(self) -> np.ndarray:
+        return np.flatnonzero(self.new_to_old < 0)
+
+    @property
+    def same_rows(self) -> bool:
+        # Same keyed rows in the same order: only values changed (or nothing did)
+        return not len(self.removed) and bool(np.array_equal(self.new_to_old, np.arange(len(self.new_to_old))))
+
+    @property
+    def empty(self) -> bool:
+        return self.same_rows and not len(self.changed)
+
+    @property
+    def reuse(self) -> np.ndarray:
+        # Per new row: old position whose derived data can be copied as is, -1 to recompute
+        reuse = self.new_to_old.copy()
+        reuse[self.changed] = -1
+        return reuse
+
+    def old_to_new(self, n_old: int) -> np.ndarray:
+        # Per old row: new position of the same, unchanged row; -1 if it was removed or changed
+        mapping = np.full(n_old, -1, dtype=np.intp)
+        reuse = self.reuse
+        kept = reuse >= 0
+        mapping[reuse[kept]] = np.flatnonzero(kept)
+        return mapping
+
+    def summary(self) -> str:
+        return f"{len(self.added)} added, {len(self.removed)} removed, {len(self.changed)} changed rows"
+
+
+def _row_identity(df: pd.DataFrame, key_cols: Sequence[str]) -> pd.MultiIndex:
+    # The seven selection keys are not unique in the workbook, so rows are matched on
+    # (key..., occurrence): the n-th row of a key in the old frame pairs with its n-th row in the new one
+    cols = list(key_cols)
+    occurrence = df.groupby(cols, sort=False, dropna=False, observed=True).cumcount()
+    # Plain values, so frames whose categoricals have different categories still match
+    return pd.MultiIndex.from_arrays([df[col].astype(object) for col in cols] + [occurrence])
+
+
+def diff_frames(old: pd.DataFrame, new: pd.DataFrame, key_cols: Sequence[Optional[str]]) -> Optional[RowDiff]:
+    # Rows of `new` matched to rows of `old` by selection key, with the changed ones flagged.
+    # Returns None when the columns differ (or a key column is missing): everything has to be rebuilt
+    cols = [col for col in key_cols if col is not None]
+    if list(old.columns) != list(new.columns) or len(cols) != len(key_cols):
+        return None
+
+    new_to_old = np.asarray(_row_identity(old, cols).get_indexer(_row_identity(new, cols)), dtype=np.intp)
+    matched = np.flatnonzero(new_to_old >= 0)
+    before = old.iloc[new_to_old[matched]].reset_index(drop=True)
+    after = new.iloc[matched].reset_index(drop=True)
+    # Categoricals only compare when their categories are identical; compare their values instead
+    categorical = [col for col in new.columns
+                   if isinstance(before[col].dtype, pd.CategoricalDtype) or isinstance(after[col].dtype, pd.CategoricalDtype)]
+    if categorical:
+        before = before.astype({col: object for col in categorical})
+        after = after.astype({col: object for col in categorical})
+    # Cell-wise comparison of all matched rows at once; missing on both sides counts as equal
+    # (nullable boolean columns give NA against a missing value, which counts as a change)
+    same = before.eq(after) | (before.isna() & after.isna())
+    differs = ~same.fillna(False).to_numpy(dtype=bool)
+    changed = matched[differs.any(axis=1)]
+
+    removed_mask = np.ones(len(old), dtype=bool)
+    removed_mask[new_to_old[matched]] = False
+    removed = np.flatnonzero(removed_mask)
+
+    touched_rows = [new.iloc[np.concatenate([changed, np.flatnonzero(new_to_old < 0)])], old.iloc[removed]]
+    touched = frozenset(
+        tuple(value.item() if isinstance(value, np.generic) else value for value in key)
+        for rows in touched_rows for key in rows[cols].itertuples(index=False, name=None)
+    )
+    changed_columns = tuple(col for col, flag in zip(new.columns, differs.any(axis=0)) if flag)
+    return RowDiff(new_to_old, changed, removed, changed_columns, touched)
+
+
+class ComparisonEngine:
+    """Loaded dataset plus every structure derived from it, built once per data version."""
+
+    def __init__(self, df: pd.DataFrame, version: Optional[str] = None):
+        self.df = df
+        self.version = version
+        self.columns = ColumnMap.resolve(df)
+        # Unit, dtype and direction of every displayed parameter, resolved once per frame
+        self.parameters = parameter_schema.ParameterSet.resolve(df, self.columns.excluded_cols)
+        self._build_indexes()
+        self.geometry = geometry.GeometryTable(df, self.columns.coord_col_pairs)
+
+    def _build_indexes(self) -> None:
+        key_cols = self.columns.key_cols
+        self.selection_index = filter_engine.SelectionIndex(self.df, key_cols)
+        # Brand logo is looked up per brand, not per row
+        self.catalog = filter_engine.DimensionCatalog(self.df, key_cols, ((self.columns.brand, self.columns.logo),))
+        self.option_tree = filter_engine.OptionTree(self.selection_index.keys(), self.catalog, key_cols)
+        self._build_airflow_index()
+
+    def _build_airflow_index(self) -> None:
+        # Interval tree over the airflow range of the first row of every selection key,
+        # for duty-point queries (units whose Minimum..Maximum airflow covers a value)
+        self._airflow_rows, _ = self.selection_index.first_positions(list(self.selection_index.keys()))
+        bounds = np.full((len(self._airflow_rows), 2), np.nan)
+        rows = self.df.iloc[self._airflow_rows]
+        for i, col in enumerate((self.columns.min_airflow, self.columns.max_airflow)):
+            if col is not None:
+                bounds[:, i] = pd.to_numeric(rows[col], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        self._airflow_bounds = bounds
+        self.airflow_index = filter_engine.IntervalIndex(bounds[:, 0], bounds[:, 1])
+
+    def patched(self, df: pd.DataFrame, diff: Optional[RowDiff], version: Optional[str] = None) -> "ComparisonEngine":
+        # Engine for an updated frame that reuses whatever the row diff leaves untouched:
+        # the index, catalog and option tree when the keyed rows are the same (patched when
+        # rows were added or removed), and the outlines of every unchanged row. This engine is not modified, so sessions still
+        # rendering with it keep a consistent view
+        columns = ColumnMap.resolve(df)
+        if diff is None or columns != self.columns:
+            return ComparisonEngine(df, version)
+
+        engine = ComparisonEngine.__new__(ComparisonEngine)
+        engine.df = df
+        engine.version = version
+        engine.columns = columns
+        engine.parameters = parameter_schema.ParameterSet.resolve(df, columns.excluded_cols) # Dtypes may have changed
+        if diff.same_rows:
+            engine.selection_index = self.selection_index
+            engine.option_tree = self.option_tree
+            if {columns.min_airflow, columns.max_airflow}.intersection(diff.changed_columns):
+                engine._build_airflow_index()
+            else:
+                engine._airflow_rows = self._airflow_rows
+                engine._airflow_bounds = self._airflow_bounds
+                engine.airflow_index = self.airflow_index
+            if columns.logo in diff.changed_columns:
+                # Same keys, so the option tree stays valid; only the brand -> logo lookup is rebuilt
+                engine.catalog = filter_engine.DimensionCatalog(df, columns.key_cols, ((columns.brand, columns.logo),))
+            else:
+                engine.catalog = self.catalog
+        else:
+            # Rows added or removed: the index and option tree are patched from the diff. The
+            # catalog (sorted distinct values, ~4 ms) and the airflow tree (~15 ms at 6,800 rows)
+            # are cheap to rebuild next to them
+            key_cols = columns.key_cols
+            engine.selection_index = self.selection_index.patched(df, diff.new_to_old, len(self.df))
+            engine.catalog = filter_engine.DimensionCatalog(df, key_cols, ((columns.brand, columns.logo),))
+            old_keys, new_keys = self.selection_index.keys(), engine.selection_index.keys()
+            engine.option_tree = self.option_tree.patched(new_keys - old_keys, old_keys - new_keys,
+                                                          engine.catalog, key_cols)
+            engine._build_airflow_index()
+
+        coord_cols = {name for pair in columns.coord_col_pairs for name in pair}
+        if diff.same_rows and not coord_cols.intersection(diff.changed_columns):
+            engine.geometry = self.geometry
+        else:
+            engine.geometry = self.geometry.patched(df, columns.coord_col_pairs, diff.reuse)
+        return engine
+
+    @classmethod
+    def from_workbook(cls, path: str, sheet_name: str = "data") -> "ComparisonEngine":
+        # Loads through the Parquet snapshot cache; the version is the workbook's mtime + size
+        return cls(data_cache.load_sheet(path, sheet_name=sheet_name), data_cache.file_version(path))
+
+    def options(self, prefix: Sequence[Any] = ()) -> List[Any]:
+        # Valid values for the dropdown after `prefix`
+        return self.option_tree.options(tuple(prefix))
+
+    def row_keys(self, positions: Sequence[int]) -> List[SelectionKey]:
+        # Selection keys of the given rows, as plain values (the same values the dropdowns offer)
+        rows = self.df[list(self.columns.key_cols)].iloc[list(positions)]
+        return [tuple(value.item() if isinstance(value, np.generic) else value for value in key)
+                for key in rows.itertuples(index=False, name=None)]
+
+    @cached_property
+    def similarity(self) -> similarity.SimilarityIndex:
+        # Built on first use (also for patched engines): normalized features and a k-d tree
+        # over the first row of every selection key
+        keys = list(self.selection_index.keys())
+        candidates, _ = self.selection_index.first_positions(keys)
+        resolved = [col for col in (self.columns.max_airflow, self.columns.min_airflow, self.columns.internal_height) if col]
+        return similarity.SimilarityIndex(self.df, candidates, self.columns.brand,
+                                          resolved + list(similarity.DEFAULT_FEATURES))
+
+    def equivalents(self, key: SelectionKey, k: int = 5) -> List[Tuple[SelectionKey, float]]:
+        # The k units of other brands whose technical parameters are closest to the unit of `key`,
+        # nearest first, as (selection key, distance in standard deviations)
+        positions, found = self.selection_index.first_positions([key])
+        if not found[0] or not self.similarity.features:
+            return []
+        matches, distances = self.similarity.nearest(int(positions[0]), k)
+        return [(key, float(distance)) for key, distance in zip(self.row_keys(matches.tolist()), distances)]
+
+    def covering_airflow(self, airflow: float, region: Any = None,
+                         recovery: Any = None) -> List[Tuple[SelectionKey, float, float]]:
+        # Units whose Minimum..Maximum airflow range covers the duty point, optionally of one
+        # region and/or recovery type, as (selection key, minimum, maximum) with the smallest
+        # sufficient unit (lowest maximum airflow) first
+        found = self.airflow_index.covering(airflow)
+        for col, value in ((self.columns.region, region), (self.columns.recovery, recovery)):
+            if value is not None and col is not None and len(found):
+                found = found[self.df[col].iloc[self._airflow_rows[found]].to_numpy() == value]
+        bounds = self._airflow_bounds[found]
+        # Row position breaks ties, so the order doesn't depend on the index's key order
+        order = np.lexsort((self._airflow_rows[found], bounds[:, 0], bounds[:, 1]))
+        keys = self.row_keys(self._airflow_rows[found[order]].tolist())
+        return [(key, float(low), float(high)) for key, (low, high) in zip(keys, bounds[order])]
+
+    def logo_for(self, brand: Any) -> Optional[str]:
+        return self.catalog.attribute(self.columns.brand, self.columns.logo, brand)
+
+    def resolve(self, keys: Sequence[SelectionKey]) -> ResolvedSelection:
+        # All selections in one batched index lookup
+        keys = [tuple(key) for key in keys]
+        positions, found = self.selection_index.first_positions(keys)
+        labels = comparison.unique_labels([key[3] for key in keys])
+        return ResolvedSelection(keys, positions, found, self.df.iloc[positions], labels)
+
+    def unit_photo(self, resolved: ResolvedSelection) -> List[Optional[str]]:
+        # Unit photo file per key (None when the key has no data or no photo)
+        photos: List[Optional[str]] = []
+        values = iter(resolved.rows[self.columns.unit_photo].tolist() if self.columns.unit_photo else [])
+        for found in resolved.found:
+            value = next(values, None) if found else None
+            photos.append(None if value is None or pd.isna(value) else value)
+        return photos
+
+    def comparison_table(self, resolved: ResolvedSelection) -> pd.DataFrame:
+        # Parameter x unit table of the matched rows (call when resolved.complete)
+        return comparison.build_comparison_frame(resolved.rows, resolved.labels, self.columns.excluded_cols)
+
+    def differences(self, resolved: ResolvedSelection, reference: int = 0) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        # (absolute, relative) differences of all numeric parameters against one of the selected units
+        return comparison.parameter_differences(resolved.rows, self.parameters.numeric, resolved.labels, reference)
+
+    def _outlines(self, resolved: ResolvedSelection) -> Tuple[geometry.GeometryTable, np.ndarray]:
+        # Geometry table holding the resolved rows' outlines, and their rows in it
+        return self.geometry, resolved.positions
+
+    def chart_frame(self, resolved: ResolvedSelection) -> Tuple[pd.DataFrame, List[str], List[str]]:
+        # Long-form outline data: (frame, plotted labels, skipped labels)
+        table, rows = self._outlines(resolved)
+        return table.chart_frame(rows, resolved.labels)
+
+    def drawable_labels(self, resolved: ResolvedSelection) -> Tuple[List[str], List[str]]:
+        # (labels with an outline to draw, labels skipped for missing coordinates), without building chart data
+        table, rows = self._outlines(resolved)
+        drawable = table.drawable[rows]
+        return ([label for label, ok in zip(resolved.labels, drawable) if ok],
+                [label for label, ok in zip(resolved.labels, drawable) if not ok])
+
+    def footprint_figure(self, resolved: ResolvedSelection, **options: Any):
+        return geometry.build_footprint_figure(self.chart_frame(resolved)[0], **options)
+
+    def footprint_image(self, resolved: ResolvedSelection, fmt: str = "png",
+                        renderer: Optional[footprint_render.FootprintRenderer] = None) -> bytes:
+        # The footprint chart as a static PNG or SVG (for reports), drawn without Plotly
+        table, rows = self._outlines(resolved)
+        drawable = table.drawable[rows]
+        rows = rows[drawable]
+        labels = [label for label, ok in zip(resolved.labels, drawable) if ok]
+        renderer = renderer or footprint_render.FootprintRenderer()
+        return renderer.render(table.x[rows], table.y[rows], labels, fmt)
+
+    def family(self, key: SelectionKey) -> Tuple[np.ndarray, List[Any]]:
+        # Row positions and sizes of every Unit size under the key's first six values
+        sizes = self.options(key[:-1])
+        positions, found = self.selection_index.first_positions([key[:-1] + (size,) for size in sizes])
+        return positions, [size for size, ok in zip(sizes, found) if ok]
+
+    def family_groups(self, resolved: ResolvedSelection) -> List[Tuple[str, np.ndarray, List[Any]]]:
+        # For the size overlay: every Unit size under each key's first six values
+        return [(label, *self.family(key)) for label, key in zip(resolved.labels, resolved.keys)]
+
+    def overlay_figure(self, resolved: ResolvedSelection):
+        return geometry.build_overlay_figure(self.geometry, self.family_groups(resolved))
+
+
+class PeriodEngines(ComparisonEngine):
+    """Engines of several periods used as one; each selection resolves against its own period's engine."""
+
+    # Nothing is copied or indexed again: the resolved rows are taken from each period's frame
+    # and their outlines stacked from the periods' geometry tables when drawn. Resolved
+    # positions count through the periods' frames one after the other
+
+    def __init__(self, engines: Sequence[Tuple[Tuple[Any, Any], ComparisonEngine]]):
+        periods, self.engines = zip(*engines)
+        self._period_index = {tuple(period): i for i, period in enumerate(periods)}
+        self._offsets = np.cumsum([0] + [len(engine.df) for engine in self.engines])
+        self.version = "+".join(str(engine.version) for engine in self.engines)
+        self.columns = self.engines[0].columns
+        # Parameter dtypes as a concatenated frame would have them (a column that is text in one period is text)
+        empty = dtype_schema.concat_frames([engine.df.iloc[:0] for engine in self.engines])
+        self.parameters = parameter_schema.ParameterSet.resolve(empty, self.columns.excluded_cols)
+
+    def engine_for(self, key: SelectionKey) -> Optional[ComparisonEngine]:
+        # Engine of the key's (year, quarter), None for a period not in this set
+        i = self._period_index.get(tuple(key[:2]))
+        return None if i is None else self.engines[i]
+
+    def _locate(self, positions: np.ndarray) -> List[Tuple[ComparisonEngine, int]]:
+        # (period engine, row position in it) of combined positions
+        periods = np.searchsorted(self._offsets, positions, side="right") - 1
+        return [(self.engines[i], int(position - self._offsets[i])) for i, position in zip(periods, positions)]
+
+    def resolve(self, keys: Sequence[SelectionKey]) -> ResolvedSelection:
+        keys = [tuple(key) for key in keys]
+        positions, found, rows = [], [], []
+        for key in keys:
+            i = self._period_index.get(key[:2])
+            position, ok = self.engines[i].selection_index.first_positions([key]) if i is not None else ([], [False])
+            found.append(ok[0])
+            if ok[0]:
+                positions.append(self._offsets[i] + position[0])
+                rows.append(self.engines[i].df.iloc[position])
+        rows = dtype_schema.concat_frames(rows) if rows else self.engines[0].df.iloc[:0]
+        labels = comparison.unique_labels([key[3] for key in keys])
+        return ResolvedSelection(keys, np.asarray(positions, dtype=np.intp), found, rows, labels)
+
+    def _outlines(self, resolved: ResolvedSelection) -> Tuple[geometry.GeometryTable, np.ndarray]:
+        parts = [(engine.geometry, [position]) for engine, position in self._locate(resolved.positions)]
+        return geometry.GeometryTable.stacked(parts), np.arange(len(parts))
+
+    def equivalents(self, key: SelectionKey, k: int = 5) -> List[Tuple[SelectionKey, float]]:
+        # Units of other brands in the key's own period
+        engine = self.engine_for(key)
+        return engine.equivalents(key, k) if engine is not None else []
+
+    def overlay_figure(self, resolved: ResolvedSelection):
+        parts, groups, start = [], [], 0
+        for label, key in zip(resolved.labels, resolved.keys):
+            engine = self.engine_for(key)
+            positions, sizes = engine.family(key)
+            parts.append((engine.geometry, positions))
+            groups.append((label, np.arange(start, start + len(positions)), sizes))
+            start += len(positions)
+        return geometry.build_overlay_figure(geometry.GeometryTable.stacked(parts), groups)
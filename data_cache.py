@@ -0,0 +1,169 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+
+import pandas as pd
+
+import dtype_schema
+
+logger = logging.getLogger(__name__)
+
+# Snapshots live next to the workbook in a hidden folder (ignored by git)
+DEFAULT_CACHE_DIR = ".cache"
+# Bumped when the stored frame changes (2: dtypes normalized by dtype_schema, 3: lone decimal commas,
+# 4: numeric categories keep their values); older snapshots and partitions are rebuilt
+SNAPSHOT_FORMAT = 4
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    # Hash the workbook in chunks so large files don't have to fit in memory
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_version(path):
+    # Cheap version token (mtime + size) used as a Streamlit cache key
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def snapshot_paths(path, sheet_name, cache_dir=DEFAULT_CACHE_DIR):
+    # One Parquet file plus a small JSON sidecar describing the source workbook
+    base = os.path.splitext(os.path.basename(path))[0]
+    stem = os.path.join(cache_dir, f"{base}.{sheet_name}")
+    return stem + ".parquet", stem + ".meta.json"
+
+
+def make_arrow_safe(df):
+    # Parquet needs one type per column; columns such as "Type" mix text and 0,
+    # so those (and only those) are stored as text while NaN stays missing
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object:
+            types = {type(v) for v in df[col].dropna()}
+            if len(types) > 1:
+                df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v)).astype(object)
+    return df
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    tmp_path = meta_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(meta, fh, indent=2)
+    os.replace(tmp_path, meta_path)
+
+
+def is_snapshot_fresh(path, sheet_name, cache_dir=DEFAULT_CACHE_DIR):
+    # Returns (fresh, meta). mtime+size is checked first; if the file was only
+    # touched or copied, the content hash decides and the meta is refreshed
+    data_path, meta_path = snapshot_paths(path, sheet_name, cache_dir)
+    meta = _read_meta(meta_path)
+    if meta is None or meta.get("format") != SNAPSHOT_FORMAT or not os.path.exists(data_path):
+        return False, meta
+
+    stat = os.stat(path)
+    if meta.get("mtime_ns") == stat.st_mtime_ns and meta.get("size") == stat.st_size:
+        return True, meta
+
+    if meta.get("size") == stat.st_size and meta.get("sha256") == file_sha256(path):
+        meta["mtime_ns"] = stat.st_mtime_ns
+        _write_meta(meta_path, meta)
+        return True, meta
+
+    return False, meta
+
+
+def build_snapshot(path, sheet_name="data", cache_dir=DEFAULT_CACHE_DIR):
+    # Parse the workbook with openpyxl, normalize its dtypes and store the sheet as a Parquet snapshot
+    start = time.perf_counter()
+    raw = pd.read_excel(path, sheet_name=sheet_name, engine="openpyxl")
+    parse_ms = (time.perf_counter() - start) * 1000.0
+    df = dtype_schema.normalize_frame(raw)
+    raw_mb, df_mb = dtype_schema.memory_mb(raw), dtype_schema.memory_mb(df)
+    logger.info("Normalized dtypes of %s[%s]: %.2f MB -> %.2f MB in memory (%.0f%% saved)",
+                path, sheet_name, raw_mb, df_mb, (1 - df_mb / raw_mb) * 100 if raw_mb else 0.0)
+
+    data_path, meta_path = snapshot_paths(path, sheet_name, cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    stat = os.stat(path)
+    try:
+        tmp_path = data_path + ".tmp"
+        make_arrow_safe(df).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, data_path)
+    except ImportError:
+        # pyarrow is not installed; keep working straight from the workbook
+        logger.warning("Parquet support unavailable, snapshot for %s not written", path)
+        return df, parse_ms
+
+    _write_meta(meta_path, {
+        "format": SNAPSHOT_FORMAT,
+        "source": os.path.abspath(path),
+        "sheet_name": sheet_name,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": file_sha256(path),
+        "rows": int(len(df)),
+        "columns": int(len(df.columns)),
+        "parse_ms": round(parse_ms, 1),
+        "memory_mb": {"loaded": round(raw_mb, 3), "normalized": round(df_mb, 3)},
+    })
+    return df, parse_ms
+
+
+def load_sheet(path, sheet_name="data", cache_dir=DEFAULT_CACHE_DIR):
+    # Load the sheet from a fresh snapshot when possible, otherwise re-parse
+    # the workbook (and rebuild the snapshot for the next cold start)
+    start = time.perf_counter()
+    fresh, meta = is_snapshot_fresh(path, sheet_name, cache_dir)
+    if fresh:
+        try:
+            df = pd.read_parquet(snapshot_paths(path, sheet_name, cache_dir)[0])
+        except (ImportError, OSError, ValueError) as e:
+            logger.warning("Could not read snapshot for %s (%s), re-parsing workbook", path, e)
+        else:
+            load_ms = (time.perf_counter() - start) * 1000.0
+            logger.info(
+                "Loaded %s[%s] from snapshot in %.1f ms (workbook parse took %.1f ms when built)",
+                path, sheet_name, load_ms, meta.get("parse_ms", float("nan")),
+            )
+            return df
+
+    df, parse_ms = build_snapshot(path, sheet_name, cache_dir)
+    total_ms = (time.perf_counter() - start) * 1000.0
+    logger.info(
+        "Parsed %s[%s] with openpyxl in %.1f ms (%.1f ms including snapshot write); snapshot was stale",
+        path, sheet_name, parse_ms, total_ms,
+    )
+    return df
+
+
+if __name__ == "__main__":
+    # Build step: python data_cache.py Data_2025.xlsx
+    parser = argparse.ArgumentParser(description="Build a Parquet snapshot of an Excel sheet.")
+    parser.add_argument("workbook", nargs="?", default="Data_2025.xlsx")
+    parser.add_argument("--sheet", default="data")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the snapshot is fresh")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.force or not is_snapshot_fresh(args.workbook, args.sheet, args.cache_dir)[0]:
+        frame, ms = build_snapshot(args.workbook, args.sheet, args.cache_dir)
+        logger.info("Snapshot built: %d rows x %d columns, workbook parse %.1f ms",
+                    len(frame), len(frame.columns), ms)
+    # Load once through the normal path to log the snapshot timing for comparison
+    load_sheet(args.workbook, args.sheet, args.cache_dir)
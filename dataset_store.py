@@ -0,0 +1,382 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import comparison_engine
+import data_cache
+import dtype_schema
+import live_reload
+
+logger = logging.getLogger(__name__)
+
+# Period workbooks next to the app: Data_2024.xlsx, Data_2025.xlsx, Data_2026.xlsx, ...
+DEFAULT_PATTERN = "Data_*.xlsx"
+
+
+def _period_name(period):
+    # File-name-safe partition name, e.g. (2025, "Q1") -> "2025_Q1"
+    return re.sub(r"[^0-9A-Za-z._-]+", "-", "_".join(str(value) for value in period))
+
+
+def _plain(value):
+    # numpy scalars from groupby keys become JSON-friendly Python values
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class DatasetStore:
+    # Many period workbooks split into one Parquet partition per (Year, Quarter).
+    # Each workbook is parsed once per version and its partitions are listed in a
+    # manifest, so the available periods are known without loading any rows. A
+    # comparison engine is built per period when a selection first touches it and
+    # kept in an LRU bounded by the frames' memory; least recently used periods are
+    # dropped first. Workbook updates (polled by live_reload) are diffed and patched
+    # into the loaded engines, and new workbooks matching the pattern are picked up
+
+    def __init__(self, paths, sheet_name="data", cache_dir=data_cache.DEFAULT_CACHE_DIR, memory_budget_mb=512,
+                 on_swap=None, pattern=None, poll_seconds=5.0, settle_seconds=1.0):
+        self.sheet_name = sheet_name
+        self.cache_dir = cache_dir
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.on_swap = on_swap # Called as on_swap(old engine, new engine, RowDiff or None) after a reload
+        self.pattern = pattern
+        self.generation = 0 # Incremented on every workbook reload
+        self.last_change = None # Summary of the latest reload
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+        self._lock = threading.RLock() # Sessions and the watcher thread share the store
+        self._reload_lock = threading.Lock() # One workbook reload at a time
+        self._manifests = {} # workbook path -> manifest (version, sha256, partitions)
+        self._engines = OrderedDict() # (period,) -> (engine, bytes), least recently used first
+        self._bytes = 0
+        for path in sorted(paths):
+            self._manifests[path] = self._load_manifest(path)
+        self.watcher = live_reload.WorkbookWatcher(
+            list(self._manifests), self._reload, {path: m["version"] for path, m in self._manifests.items()},
+            poll_seconds=poll_seconds, settle_seconds=settle_seconds,
+            discover=(lambda: sorted(glob.glob(pattern))) if pattern else None,
+        )
+
+    @classmethod
+    def from_pattern(cls, pattern=DEFAULT_PATTERN, **options):
+        paths = sorted(glob.glob(pattern))
+        if not paths:
+            raise FileNotFoundError(f"No workbooks match {pattern}")
+        return cls(paths, pattern=pattern, **options)
+
+    # Partitions on disk
+
+    def _partition_dir(self, path):
+        return os.path.join(self.cache_dir, "partitions", os.path.splitext(os.path.basename(path))[0])
+
+    def _load_manifest(self, path, version=None):
+        # Manifest of a workbook's partitions, rebuilt when the workbook changed
+        version = version or data_cache.file_version(path)
+        manifest_path = os.path.join(self._partition_dir(path), "manifest.json")
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as fh:
+                manifest = json.load(fh)
+        except (OSError, ValueError):
+            manifest = None
+
+        if manifest is not None and manifest.get("format") == data_cache.SNAPSHOT_FORMAT and all(
+                os.path.exists(os.path.join(self._partition_dir(path), p["file"])) for p in manifest["partitions"]):
+            if manifest.get("version") == version:
+                if "parse_ms" not in manifest: # Written before the parse time was kept in the manifest
+                    meta = data_cache.is_snapshot_fresh(path, self.sheet_name, self.cache_dir)[1] or {}
+                    manifest["parse_ms"] = meta.get("parse_ms")
+                    self._write_manifest(manifest_path, manifest)
+                return self._with_periods(manifest)
+            # Touched or copied without changes: the snapshot check compares content hashes
+            fresh, meta = data_cache.is_snapshot_fresh(path, self.sheet_name, self.cache_dir)
+            if fresh and meta and manifest.get("sha256") == meta.get("sha256"):
+                manifest["version"] = version
+                self._write_manifest(manifest_path, manifest)
+                return self._with_periods(manifest)
+        # The previous version's files stay on disk for views pinned before this reload
+        keep = {p.get("file") for p in manifest.get("partitions", [])} if manifest else set()
+        return self._build_partitions(path, version, keep)
+
+    def _build_partitions(self, path, version, keep=()):
+        start = time.perf_counter()
+        # make_arrow_safe on the whole sheet so a column gets the same type in every partition
+        # (the sheet is already normalized, this only covers text columns left as loaded)
+        df = data_cache.make_arrow_safe(data_cache.load_sheet(path, self.sheet_name, self.cache_dir))
+        columns = comparison_engine.ColumnMap.resolve(df)
+        if columns.year is None or columns.quarter is None:
+            raise ValueError(f"{path} has no Year/Quarter columns to partition by")
+
+        out_dir = self._partition_dir(path)
+        os.makedirs(out_dir, exist_ok=True)
+        meta = data_cache.is_snapshot_fresh(path, self.sheet_name, self.cache_dir)[1] or {}
+        # File names carry the workbook content hash, so a reload never overwrites a partition
+        # that a pinned view (see StoreView) may still read
+        suffix = "." + meta["sha256"][:12] if meta.get("sha256") else ""
+        partitions = []
+        # Rows without a year or quarter can't be selected and are left out
+        for period, part in df.groupby([columns.year, columns.quarter], sort=True, observed=True):
+            period = [_plain(value) for value in period]
+            file_name = _period_name(period) + suffix + ".parquet"
+            tmp_path = os.path.join(out_dir, file_name + ".tmp")
+            part.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, os.path.join(out_dir, file_name))
+            partitions.append({"period": period, "file": file_name, "rows": int(len(part))})
+        # Remove partitions of periods that are no longer in the workbook and of older versions
+        for name in set(os.listdir(out_dir)) - {p["file"] for p in partitions} - set(keep) - {"manifest.json"}:
+            os.remove(os.path.join(out_dir, name))
+
+        manifest = {"format": data_cache.SNAPSHOT_FORMAT, "source": os.path.abspath(path), "version": version,
+                    "sha256": meta.get("sha256"), "parse_ms": meta.get("parse_ms"), "partitions": partitions}
+        self._write_manifest(os.path.join(out_dir, "manifest.json"), manifest)
+        logger.info("Partitioned %s into %d periods in %.1f ms", path, len(partitions),
+                    (time.perf_counter() - start) * 1000.0)
+        return self._with_periods(manifest)
+
+    @staticmethod
+    def _write_manifest(manifest_path, manifest):
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump({k: v for k, v in manifest.items() if k != "periods"}, fh, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+    @staticmethod
+    def _with_periods(manifest):
+        # {period tuple: partition} next to the JSON list, for lookups
+        manifest["periods"] = {tuple(p["period"]): p for p in manifest["partitions"]}
+        return manifest
+
+    # Periods (a view of the current generation; see StoreView)
+
+    def view(self):
+        # The manifests and loaded engines as of now. A page rerun resolves everything
+        # through one view, so a reload in the middle of it can't mix workbook versions
+        with self._lock:
+            return StoreView(self, self.generation, dict(self._manifests),
+                             {key: engine for key, (engine, _) in self._engines.items()}, self.last_change)
+
+    def periods(self):
+        return self.view().periods()
+
+    def years(self):
+        return self.view().years()
+
+    def quarters(self, year):
+        return self.view().quarters(year)
+
+    def match_key(self, values):
+        return self.view().match_key(values)
+
+    # Engines
+
+    def _frame(self, key, manifests=None):
+        # Rows of the given periods from every workbook that has them, and a version token
+        # naming the periods and the workbook versions they came from
+        frames = []
+        versions = []
+        for path, manifest in (self._manifests if manifests is None else manifests).items():
+            for period in key:
+                partition = manifest["periods"].get(period)
+                if partition is not None:
+                    start = time.perf_counter()
+                    frames.append(pd.read_parquet(os.path.join(self._partition_dir(path), partition["file"])))
+                    versions.append(manifest["version"])
+                    # Also on a warm start, where no workbook is parsed: the partition read next to
+                    # the parse time recorded when the partitions were built
+                    parse_ms = manifest.get("parse_ms")
+                    logger.info("Loaded %s %s from its Parquet partition in %.1f ms (workbook parse took %s when built)",
+                                os.path.basename(path), _period_name(period), (time.perf_counter() - start) * 1000.0,
+                                "unknown time" if parse_ms is None else f"{parse_ms:.1f} ms")
+        if not frames:
+            raise KeyError(f"No data for periods {list(key)}")
+        df = dtype_schema.concat_frames(frames)
+        version = "+".join(_period_name(period) for period in key) + "@" + ",".join(sorted(set(versions)))
+        return df, version
+
+    @staticmethod
+    def _engine_bytes(engine):
+        return int(engine.df.memory_usage(deep=True).sum() + engine.geometry.table.memory_usage().sum())
+
+    def engine(self, periods):
+        # Comparison engine over the rows of the given (year, quarter) periods
+        return self.view().engine(periods)
+
+    def _load(self, key, generation, manifests):
+        # Engine for a view. The lock is only held for the LRU lookup and the insert: the
+        # Parquet read and index build run outside it, so other sessions' views are not held
+        # up. An engine built while a reload was published belongs to the older view and is
+        # not cached
+        with self._lock:
+            entry = self._engines.get(key) if generation == self.generation else None
+            if entry is not None:
+                self._engines.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        engine = comparison_engine.ComparisonEngine(*self._frame(key, manifests))
+        with self._lock:
+            self.loads += 1
+            if generation != self.generation:
+                return engine
+            entry = self._engines.get(key)
+            if entry is not None: # Another session loaded the same period meanwhile
+                self._engines.move_to_end(key)
+                return entry[0]
+            self._put(key, engine)
+            return engine
+
+    def _touch(self, key, engine):
+        # A view reused one of its engines: count the hit and keep it recently used in the LRU
+        with self._lock:
+            self.hits += 1
+            entry = self._engines.get(key)
+            if entry is not None and entry[0] is engine:
+                self._engines.move_to_end(key)
+
+    def _put(self, key, engine):
+        # Insert or replace, then evict least recently used engines over the budget (always keep the newest)
+        size = self._engine_bytes(engine)
+        previous = self._engines.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous[1]
+        self._engines[key] = (engine, size)
+        self._bytes += size
+        while len(self._engines) > 1 and self._bytes > self.memory_budget:
+            _, (_, evicted) = self._engines.popitem(last=False)
+            self._bytes -= evicted
+            self.evictions += 1
+
+    def _reload(self, path, version):
+        # Watcher callback: re-partition the workbook and patch the loaded engines it feeds.
+        # The workbook parse, partition reads and diffs run outside the store lock, which is
+        # only taken to publish the new manifests and engines in one step
+        with self._reload_lock:
+            with self._lock:
+                manifests = dict(self._manifests)
+                loaded = [(key, engine) for key, (engine, _) in self._engines.items()]
+            old_periods = set(manifests[path]["periods"]) if path in manifests else set()
+            manifests[path] = self._load_manifest(path, version)
+            touched = old_periods | set(manifests[path]["periods"])
+            swaps = []
+            patched = {}
+            for key, engine in loaded:
+                if not touched.intersection(key):
+                    continue
+                try:
+                    df, new_version = self._frame(key, manifests)
+                except KeyError: # The periods are gone from every workbook
+                    continue
+                diff = comparison_engine.diff_frames(engine.df, df, engine.columns.key_cols)
+                patched[key] = engine.patched(df, diff, new_version)
+                swaps.append((engine, patched[key], diff))
+
+            with self._lock:
+                self._manifests = manifests
+                # Engines of the touched periods, including any loaded from the old partitions
+                # while this reload ran, are replaced by the patched ones or dropped
+                for key in [key for key in self._engines if touched.intersection(key)]:
+                    self._bytes -= self._engines.pop(key)[1]
+                for key, engine in patched.items():
+                    self._put(key, engine) # The swap: sessions pick up the new engine on their next rerun
+                self.generation += 1
+                changes = [diff.summary() if diff is not None else "columns changed" for _, _, diff in swaps]
+                self.last_change = f"{os.path.basename(path)}: {'; '.join(changes) or 'no loaded periods affected'}"
+        logger.info("Reloaded %s (%s)", path, self.last_change)
+        if self.on_swap is not None:
+            for swap in swaps:
+                self.on_swap(*swap)
+
+    def start(self):
+        self.watcher.start()
+        return self
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workbooks": len(self._manifests),
+                "periods": sum(len(manifest["periods"]) for manifest in self._manifests.values()),
+                "loaded": [list(key) for key in self._engines],
+                "bytes": self._bytes,
+                "budget_bytes": self.memory_budget,
+                "hits": self.hits,
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "generation": self.generation,
+            }
+
+
+class StoreView:
+    # One generation of a DatasetStore: its periods and the engines over them as they were
+    # when the view was taken. Engines loaded through the view are kept in it, so asking
+    # twice for the same periods gives the same engine even if the store reloaded between
+
+    def __init__(self, store, generation, manifests, engines, last_change=None):
+        self.store = store
+        self.generation = generation
+        self.last_change = last_change
+        self._manifests = manifests
+        self._engines = engines
+
+    def periods(self):
+        return sorted({period for manifest in self._manifests.values() for period in manifest["periods"]})
+
+    def years(self):
+        return sorted({period[0] for period in self.periods()})
+
+    def quarters(self, year):
+        return sorted({period[1] for period in self.periods() if period[0] == year})
+
+    def match_key(self, values):
+        # Selection key for seven values given as text (CSV cells, URL parameters): each value is
+        # matched to the dropdown option with the same text, level by level as the dropdowns offer
+        # them. Returns the matched prefix, shorter than seven values when a level has no match
+        values = ["" if value is None else str(value).strip() for value in values]
+        year = next((option for option in self.years() if str(option) == values[0]), None) if values else None
+        if year is None:
+            return ()
+        quarter = next((option for option in self.quarters(year) if len(values) > 1 and str(option) == values[1]), None)
+        if quarter is None:
+            return (year,)
+        engine = self.engine([(year, quarter)])
+        key = (year, quarter)
+        for value in values[2:7]:
+            option = next((option for option in engine.options(key) if str(option) == value), None)
+            if option is None:
+                break
+            key += (option,)
+        return key
+
+    def engine(self, periods):
+        # Comparison engine over the rows of the given (year, quarter) periods. The store caches
+        # one engine per period; several periods are combined without copying their rows
+        key = tuple(sorted({tuple(period) for period in periods}))
+        engine = self._engines.get(key)
+        if engine is None:
+            if len(key) == 1:
+                engine = self.store._load(key, self.generation, self._manifests)
+            else:
+                engine = comparison_engine.PeriodEngines([(period, self.engine([period])) for period in key])
+            self._engines[key] = engine
+        elif len(key) == 1:
+            self.store._touch(key, engine)
+        return engine
+
+
+if __name__ == "__main__":
+    # Build step: partition every period workbook ahead of the first page load
+    parser = argparse.ArgumentParser(description="Partition period workbooks into per-Year/Quarter Parquet files.")
+    parser.add_argument("pattern", nargs="?", default=DEFAULT_PATTERN)
+    parser.add_argument("--cache-dir", default=data_cache.DEFAULT_CACHE_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    store = DatasetStore.from_pattern(args.pattern, cache_dir=args.cache_dir)
+    for period in store.periods():
+        print(period)
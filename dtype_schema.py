@@ -0,0 +1,277 @@
+import argparse
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+# Kinds of column the loader normalizes to
+CATEGORY = "category" # Repeated text -> pandas categorical
+FLAG = "flag" # YES/NO -> nullable boolean
+NUMBER = "number" # Numbers, also when typed as text ("1 600", "0,6") -> smallest lossless numeric dtype
+RANGE = "range" # Numbers or "420-1600" style ranges -> "<col> (min)" and "<col> (max)" when ranges occur
+
+# Explicit kinds for the catalogue's known columns; any other column is inferred from its values.
+# A column is only converted when all of its values fit the kind, otherwise it is left as loaded
+SCHEMA = {
+    "Year": NUMBER,
+    "Quarter": CATEGORY,
+    "Region": CATEGORY,
+    "Brand name": CATEGORY,
+    "Brand logo": CATEGORY,
+    "Unit name": CATEGORY,
+    "Unit photo": CATEGORY,
+    "Unit size": CATEGORY,
+    "Recovery type": CATEGORY,
+    "Motor type": CATEGORY,
+    "Insulation material": CATEGORY,
+    "Type": CATEGORY, # Text with 0 for "none"
+    "Material": CATEGORY,
+    "Minimum airflow": RANGE,
+    "Maximum airflow": RANGE,
+    "Maximum airflow (ErP2018)": RANGE,
+}
+
+FLAG_VALUES = {"YES": True, "NO": False}
+# Inferred text columns become categoricals when at most this share of their values is distinct
+CATEGORY_MAX_SHARE = 0.5
+
+# Thousands separators between digits (space, no-break or thin space), a trailing unit and range separators
+_THOUSANDS = re.compile(r"(?<=\d)[\s\u00a0\u202f](?=\d{3}(?!\d))")
+# Digit grouping with commas or dots ("1,600,000", "1.600,5"); the integer part never starts with 0
+_GROUPED = {
+    ",": re.compile(r"^[+-]?[1-9]\d{0,2}(?:,\d{3})+(?:\.\d+)?$"),
+    ".": re.compile(r"^[+-]?[1-9]\d{0,2}(?:\.\d{3})+(?:,\d+)?$"),
+}
+_UNIT_SUFFIX = re.compile(r"\s*(?:m3/h|m³/h|l/s|mm|kw|pa|%)$", re.IGNORECASE)
+_NUMBER_TEXT = r"[+-]?\d[\d\s\u00a0\u202f]*(?:[.,]\d+)?"
+_RANGE = re.compile(rf"^({_NUMBER_TEXT})\s*(?:-|–|—|\.\.\.?|to)\s*({_NUMBER_TEXT})$", re.IGNORECASE)
+
+
+def _clean(value):
+    return _UNIT_SUFFIX.sub("", str(value).strip())
+
+
+def _decimal_text(text):
+    # Number text with a decimal point and no grouping, or None when the separators don't fit.
+    # A lone comma is a decimal comma ("0,6", "2,250"). Commas or dots only group digits when
+    # the text clearly groups: several groups ("1,600,000") or both separators ("1,600.5",
+    # "1.600,5"), and never after an integer part of 0
+    if "," in text and "." in text:
+        group = "," if text.rfind(",") < text.rfind(".") else "." # The separator that comes first groups
+    elif text.count(",") > 1 or text.count(".") > 1:
+        group = "," if "," in text else "."
+    else:
+        return text.replace(",", ".")
+    if not _GROUPED[group].match(text):
+        return None
+    return text.replace(group, "").replace(",", ".")
+
+
+def _number(value):
+    # One cell as a float (NaN when it is not a number); see _decimal_text for commas and dots
+    if isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, (bool, np.bool_)):
+        return float(value)
+    text = _decimal_text(_THOUSANDS.sub("", _clean(value)))
+    if text is None:
+        return np.nan
+    try:
+        return float(text)
+    except ValueError:
+        return np.nan
+
+
+def _range(value):
+    # (low, high) of a "420-1600" cell, or the same number twice for a plain number
+    match = _RANGE.match(_clean(value)) if isinstance(value, str) else None
+    if match:
+        return _number(match.group(1)), _number(match.group(2))
+    number = _number(value)
+    return number, number
+
+
+def _flag(value):
+    return FLAG_VALUES.get(_clean(value).upper())
+
+
+def _per_value(series, parse, width=1):
+    # Run a Python cell parser once per distinct value and broadcast the results back
+    # through the factorize codes (missing cells give NaN). Catalogue columns repeat a
+    # handful of values, so this is far cheaper than parsing every cell
+    codes, uniques = pd.factorize(series)
+    parsed = np.array([parse(value) for value in uniques] + [(np.nan,) * width if width > 1 else np.nan],
+                      dtype=float if width > 1 or parse is not _flag else object)
+    return parsed[codes]
+
+
+def parse_numbers(series):
+    # Float Series of the values, parsing numbers typed as text; NaN where a value is not a number
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series.astype(float)
+    return pd.Series(_per_value(series, _number).astype(float), index=series.index, name=series.name)
+
+
+def parse_ranges(series):
+    # (low, high) float Series: a range cell gives both bounds, a plain number gives the same value twice
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series.astype(float), series.astype(float)
+    bounds = _per_value(series, _range, width=2)
+    return (pd.Series(bounds[:, 0], index=series.index, name=series.name),
+            pd.Series(bounds[:, 1], index=series.index, name=series.name))
+
+
+
+def downcast(numbers):
+    # Smallest dtype that holds the values exactly: a small integer type when all values are
+    # whole (and present), float32 when that is lossless, float64 otherwise
+    values = numbers.to_numpy(dtype=float)
+    present = ~np.isnan(values)
+    if present.all() and len(values) and (values == np.round(values)).all():
+        return pd.to_numeric(numbers.astype(np.int64), downcast="integer")
+    as32 = values.astype(np.float32)
+    if np.array_equal(as32[present].astype(float), values[present]):
+        return pd.Series(as32, index=numbers.index, name=numbers.name)
+    return numbers.astype(float)
+
+
+def column_kind(name, series, schema=SCHEMA):
+    # Kind a column is normalized to, or None to leave it as loaded. Text columns are
+    # inspected through their distinct values only
+    if isinstance(series.dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(series):
+        return None # Already normalized
+    values = series.dropna()
+    if not len(values):
+        return None
+    numeric = pd.api.types.is_numeric_dtype(series)
+    uniques = [] if numeric else pd.unique(values)
+    kind = schema.get(name)
+    if kind is None:
+        if numeric:
+            return NUMBER
+        if all(_flag(value) is not None for value in uniques):
+            return FLAG
+        if not any(np.isnan(_number(value)) for value in uniques):
+            return NUMBER
+        if not any(np.isnan(_range(value)[0]) for value in uniques):
+            return RANGE
+        if len({str(value) for value in uniques}) <= CATEGORY_MAX_SHARE * len(values):
+            return CATEGORY
+        return None
+    # Explicit kinds are checked against the values
+    if kind == FLAG and not all(_flag(value) is not None for value in uniques):
+        return None
+    if kind == NUMBER and any(np.isnan(_number(value)) for value in uniques):
+        return None
+    if kind == RANGE and any(np.isnan(_range(value)[0]) for value in uniques):
+        return None
+    return kind
+
+
+def normalize_frame(df, schema=SCHEMA):
+    # Compact copy of a loaded sheet: repeated text as categoricals, YES/NO as booleans, numbers
+    # (also typed as text) downcast, and range cells split into min/max columns in place
+    columns = {}
+    for name in df.columns:
+        series = df[name]
+        kind = column_kind(name, series, schema)
+        if kind == CATEGORY:
+            if series.dtype == object and len({type(value) for value in series.dropna()}) > 1:
+                # Mixed cells (text and 0) are categorized as text, as make_arrow_safe stores them;
+                # missing values stay missing
+                series = series.where(series.isna(), series.astype(str))
+            # Otherwise the loaded values are the categories, so numeric sizes still sort as numbers
+            columns[name] = series.astype("category")
+        elif kind == FLAG:
+            columns[name] = pd.Series(_per_value(series, _flag), index=df.index).astype("boolean")
+        elif kind == NUMBER:
+            columns[name] = downcast(parse_numbers(series))
+        elif kind == RANGE:
+            low, high = parse_ranges(series)
+            if low.equals(high): # Plain numbers only
+                columns[name] = downcast(low)
+            else:
+                columns[f"{name} (min)"] = downcast(low)
+                columns[f"{name} (max)"] = downcast(high)
+        else:
+            columns[name] = series
+    return pd.DataFrame(columns, index=df.index)
+
+
+def concat_frames(frames):
+    # pd.concat that keeps categoricals: categories are unioned first, since concatenating
+    # categoricals with different categories falls back to object columns
+    frames = list(frames)
+    if len(frames) == 1:
+        return frames[0]
+    aligned = [frame.copy(deep=False) for frame in frames]
+    for name in frames[0].columns:
+        if all(isinstance(frame[name].dtype, pd.CategoricalDtype) for frame in frames if name in frame):
+            categories = pd.api.types.union_categoricals(
+                [frame[name] for frame in frames if name in frame], sort_categories=True).categories
+            for frame in aligned:
+                if name in frame:
+                    frame[name] = frame[name].cat.set_categories(categories)
+    return pd.concat(aligned, ignore_index=True)
+
+
+def memory_mb(df):
+    return df.memory_usage(deep=True).sum() / (1024 * 1024)
+
+
+def filter_speedup(before, after, repeat=50):
+    # Median time of `col == value` on the loaded and the normalized frame for every categorical
+    # and boolean column, filtering on its most frequent value. {column: (before ms, after ms)}
+    timings = {}
+    for name in after.columns:
+        dtype = after[name].dtype
+        if name not in before or not (isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(dtype)):
+            continue
+        counts = after[name].value_counts()
+        if not len(counts):
+            continue
+        value = counts.index[0]
+        raw_value = next(iter(before[name][after[name] == value].dropna()), value) # Same value as loaded (e.g. "YES")
+        result = []
+        for frame, target in ((before, raw_value), (after, value)):
+            column = frame[name]
+            runs = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                column == target
+                runs.append((time.perf_counter() - start) * 1000.0)
+            result.append(float(np.median(runs)))
+        timings[name] = tuple(result)
+    return timings
+
+
+if __name__ == "__main__":
+    # Report what normalization does to a workbook: kinds, memory and equality-filter timings
+    parser = argparse.ArgumentParser(description="Report dtype normalization of a catalogue workbook.")
+    parser.add_argument("workbook", nargs="?", default="Data_2025.xlsx")
+    parser.add_argument("--sheet", default="data")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    raw = pd.read_excel(args.workbook, sheet_name=args.sheet, engine="openpyxl")
+    start = time.perf_counter()
+    normalized = normalize_frame(raw)
+    normalize_ms = (time.perf_counter() - start) * 1000.0
+
+    kinds = {}
+    for name in raw.columns:
+        kinds.setdefault(column_kind(name, raw[name]) or "unchanged", []).append(name)
+    for kind, names in kinds.items():
+        print(f"{kind:<10} {len(names):>3} columns: {', '.join(map(str, names[:8]))}{' ...' if len(names) > 8 else ''}")
+
+    before_mb, after_mb = memory_mb(raw), memory_mb(normalized)
+    print(f"\nNormalized {len(raw)} rows x {len(raw.columns)} columns in {normalize_ms:.1f} ms")
+    print(f"Memory: {before_mb:.2f} MB -> {after_mb:.2f} MB ({1 - after_mb / before_mb:.0%} saved)")
+
+    timings = filter_speedup(raw, normalized, args.repeat)
+    if timings:
+        print(f"\n{'column':<40} {'loaded ms':>10} {'normalized ms':>14} {'speedup':>8}")
+        for name, (before_ms, after_ms) in timings.items():
+            print(f"{str(name)[:40]:<40} {before_ms:>10.4f} {after_ms:>14.4f} {before_ms / after_ms:>7.1f}x")
+        total_before = sum(t[0] for t in timings.values())
+        total_after = sum(t[1] for t in timings.values())
+        print(f"{'all equality filters':<40} {total_before:>10.4f} {total_after:>14.4f} {total_before / total_after:>7.1f}x")
@@ -0,0 +1,75 @@
+import threading
+from collections import OrderedDict
+
+import plotly.io as pio
+
+
+class FigureCache:
+    # Built Plotly figures stored as JSON strings in a bounded LRU cache.
+    # A figure is built and serialized once per key; hits only parse the JSON,
+    # and sessions never share (or mutate) the same figure object
+
+    def __init__(self, max_entries=128, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_json(self, key, build):
+        # JSON of the figure for `key`; build() is only called on a miss
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return data
+            self.misses += 1
+
+        data = build().to_json()
+
+        with self._lock:
+            if key not in self._cache:
+                self._cache[key] = data
+                self._bytes += len(data)
+            self._cache.move_to_end(key)
+            # Evict least recently used figures until both limits hold (always keep the newest)
+            while len(self._cache) > 1 and (len(self._cache) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._cache.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+        return data
+
+    def get(self, key, build):
+        # Figure object for st.plotly_chart, rebuilt from the cached JSON
+        return pio.from_json(self.get_json(key, build), skip_invalid=True)
+
+    def migrate(self, translate):
+        # Re-key the cache after a data update: translate(key) returns the key the figure is
+        # valid under in the new version, or None to drop it (its rows changed or went away)
+        with self._lock:
+            migrated = OrderedDict()
+            for key, data in self._cache.items():
+                new_key = translate(key)
+                if new_key is not None:
+                    migrated[new_key] = data
+            self._cache = migrated
+            self._bytes = sum(len(data) for data in migrated.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._cache),
+                "bytes": self._bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._bytes = 0
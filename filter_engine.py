@@ -0,0 +1,257 @@
+import numpy as np
+import pandas as pd
+
+
+def _python_scalar(value):
+    # numpy scalars (np.int64 years, np.float64 sizes) become plain Python values
+    return value.item() if isinstance(value, np.generic) else value
+
+
+class DimensionCatalog:
+    # Distinct, sorted, plain-typed values of each filter column, plus simple
+    # per-value attributes such as brand -> logo file. Built once per data
+    # version and shared by every comparison column
+
+    def __init__(self, df, cols, attributes=()):
+        self._values = {}
+        self._ranks = {}
+        for col in cols:
+            if col is None or col not in df.columns:
+                continue
+            values = sorted(_python_scalar(v) for v in df[col].dropna().unique())
+            self._values[col] = values
+            self._ranks[col] = {value: rank for rank, value in enumerate(values)}
+
+        # (key_col, value_col) pairs -> {key: value of the first row with that key}
+        self._attributes = {}
+        for key_col, value_col in attributes:
+            if key_col is None or value_col is None:
+                continue
+            first_rows = df[[key_col, value_col]].dropna(subset=[key_col]).drop_duplicates(subset=[key_col])
+            self._attributes[(key_col, value_col)] = {
+                _python_scalar(key): (None if pd.isna(value) else value)
+                for key, value in zip(first_rows[key_col], first_rows[value_col])
+            }
+
+    def values(self, col):
+        return self._values.get(col, [])
+
+    def ranks(self, col):
+        # {value: position in the sorted distinct values}
+        return self._ranks.get(col, {})
+
+    def attribute(self, key_col, value_col, key):
+        return self._attributes.get((key_col, value_col), {}).get(key)
+
+
+class SelectionIndex:
+    # Maps every (year, quarter, region, brand, unit, recovery, size) tuple to the
+    # positions of its rows, so resolving a selection is a dict lookup instead of
+    # seven boolean masks over the whole frame
+
+    def __init__(self, df, key_cols):
+        self.key_cols = tuple(key_cols)
+        self._empty = np.empty(0, dtype=np.intp)
+        # groupby(...).indices builds the whole mapping in one pass; rows with a
+        # missing key value can't be selected from the dropdowns and are skipped; categorical
+        # columns only contribute the combinations that occur (observed=True)
+        self._positions = {
+            key: np.asarray(positions, dtype=np.intp)
+            for key, positions in df.groupby(list(self.key_cols), sort=False, dropna=True, observed=True).indices.items()
+        }
+
+    def patched(self, df, new_to_old, n_old):
+        # Index of an updated frame from this one: positions of kept rows are mapped through
+        # new_to_old (per new row, its old position or -1 if added) and only the added rows
+        # are grouped. Same keys and positions as building it from `df`; keys are listed in the
+        # order of their first row
+        index = SelectionIndex.__new__(SelectionIndex)
+        index.key_cols = self.key_cols
+        index._empty = self._empty
+        old_to_new = np.full(n_old, -1, dtype=np.intp)
+        kept = np.flatnonzero(new_to_old >= 0)
+        old_to_new[new_to_old[kept]] = kept
+
+        keys = list(self._positions)
+        ids = {key: i for i, key in enumerate(keys)}
+        lengths = np.fromiter((len(positions) for positions in self._positions.values()), dtype=np.intp, count=len(keys))
+        positions = old_to_new[np.concatenate(list(self._positions.values())) if keys else self._empty]
+        key_ids = np.repeat(np.arange(len(keys), dtype=np.intp), lengths)
+        keep = positions >= 0 # Removed rows drop out
+        positions, key_ids = [positions[keep]], [key_ids[keep]]
+
+        added = np.flatnonzero(new_to_old < 0)
+        if len(added):
+            groups = df.iloc[added].groupby(list(self.key_cols), sort=False, dropna=True, observed=True).indices
+            for key, rows in groups.items():
+                if key not in ids:
+                    ids[key] = len(keys)
+                    keys.append(key)
+                positions.append(added[rows])
+                key_ids.append(np.full(len(rows), ids[key], dtype=np.intp))
+        positions, key_ids = np.concatenate(positions), np.concatenate(key_ids)
+
+        # Rows of a key in load order, keys in order of their first row
+        order = np.lexsort((positions, key_ids))
+        positions, key_ids = positions[order], key_ids[order]
+        counts = np.bincount(key_ids, minlength=len(keys))
+        parts = np.split(positions, np.cumsum(counts)[:-1])
+        present = np.flatnonzero(counts)
+        firsts = np.array([parts[i][0] for i in present], dtype=np.intp)
+        index._positions = {keys[i]: parts[i] for i in present[np.argsort(firsts, kind="stable")]}
+        return index
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, key):
+        return tuple(key) in self._positions
+
+    def positions(self, key):
+        # Row positions (in load order) for a full seven-value key
+        return self._positions.get(tuple(key), self._empty)
+
+    def lookup(self, df, key):
+        # Same result as chaining df[col] == value for every key column
+        return df.iloc[self.positions(key)]
+
+    def first_positions(self, keys):
+        # Batched lookup for several selections at once. Returns (positions, found):
+        # the position of the first matching row of every matched key, in key order
+        firsts = [self._positions.get(tuple(key), self._empty)[:1] for key in keys]
+        found = [len(positions) > 0 for positions in firsts]
+        return (np.concatenate(firsts) if firsts else self._empty), found
+
+    def first_rows(self, df, keys):
+        # Same as first_positions, but gathers the rows with a single iloc
+        positions, found = self.first_positions(keys)
+        return df.iloc[positions], found
+
+    def keys(self):
+        # Every valid seven-value combination present in the data
+        return self._positions.keys()
+
+
+class OptionTree:
+    # Prefix tree of the valid key combinations. Each node stores the sorted
+    # values allowed at the next level, so a dependent dropdown gets its
+    # options by walking the choices made above it (no scan, no sort).
+    # With a catalog, options follow the catalog's order and plain value types
+
+    def __init__(self, keys, catalog=None, key_cols=()):
+        root = {}
+        for key in keys:
+            node = root
+            for value in key:
+                node = node.setdefault(_python_scalar(value), {})
+        self._level_ranks = [catalog.ranks(col) for col in key_cols] if catalog is not None else []
+        self._root = self._freeze(root, 0)
+
+    def _freeze(self, node, depth):
+        # Turn nested dicts into (sorted options, children) pairs once at build time
+        ranks = self._level_ranks[depth] if depth < len(self._level_ranks) else None
+        values = sorted(node, key=ranks.__getitem__) if ranks else sorted(node)
+        return values, {value: self._freeze(child, depth + 1) for value, child in node.items()}
+
+    def patched(self, added, removed, catalog=None, key_cols=()):
+        # Tree with some keys added and some removed. Only the nodes on the path of a changed key
+        # are copied; every other subtree is shared with this tree, which is left unchanged
+        tree = OptionTree.__new__(OptionTree)
+        tree._level_ranks = [catalog.ranks(col) for col in key_cols] if catalog is not None else []
+        plain = lambda keys: [tuple(_python_scalar(value) for value in key) for key in keys]
+        tree._root = tree._patch(self._root, 0, plain(added), plain(removed))
+        return tree
+
+    def _patch(self, node, depth, added, removed):
+        # New (options, children) for `node` with the given key suffixes added and removed
+        values, children = node
+        children = dict(children)
+        changed = {}
+        for suffix, is_added in [(key, True) for key in added] + [(key, False) for key in removed]:
+            changed.setdefault(suffix[0], ([], []))[0 if is_added else 1].append(suffix[1:])
+        for value, (sub_added, sub_removed) in changed.items():
+            if sub_added and not sub_added[0] or sub_removed and not sub_removed[0]:
+                # Last level: the value itself is the key's end
+                if sub_added:
+                    children[value] = ([], {})
+                else:
+                    children.pop(value, None)
+                continue
+            child = self._patch(children.get(value, ([], {})), depth + 1, sub_added, sub_removed)
+            if child[0]:
+                children[value] = child
+            else: # No key goes through this value any more
+                children.pop(value, None)
+        ranks = self._level_ranks[depth] if depth < len(self._level_ranks) else None
+        return (sorted(children, key=ranks.__getitem__) if ranks else sorted(children)), children
+
+    def options(self, prefix=()):
+        # Options for the level right after `prefix`; empty if the prefix is not a valid combination
+        values, children = self._root
+        for value in prefix:
+            if value not in children:
+                return []
+            values, children = children[value]
+        return values
+
+
+class IntervalIndex:
+    # Static centered interval tree over closed [low, high] ranges, e.g. the airflow
+    # range of every unit. Each node keeps the ranges that contain its center, sorted
+    # once by low and once by high; the ranges entirely below or above the center go
+    # to the left or right child. A point query walks one root-to-leaf path and takes
+    # a searchsorted slice per node, so it never scans the ranges that can't match.
+    # Ranges with a missing bound are left out
+
+    def __init__(self, lows, highs):
+        lows = np.asarray(lows, dtype=float)
+        highs = np.asarray(highs, dtype=float)
+        self._center, self._left, self._right = [], [], []
+        self._by_low, self._lows, self._by_high, self._highs = [], [], [], []
+        ids = np.flatnonzero(~np.isnan(lows) & ~np.isnan(highs))
+        self.size = len(ids)
+        if len(ids):
+            self._build(ids, np.minimum(lows, highs), np.maximum(lows, highs))
+
+    def _build(self, ids, lows, highs):
+        # The center is the median endpoint, which belongs to at least one range, so every node keeps one
+        endpoints = np.concatenate([lows[ids], highs[ids]])
+        center = np.partition(endpoints, len(ids))[len(ids)]
+        below = highs[ids] < center
+        above = lows[ids] > center
+        here = ids[~below & ~above]
+        node = len(self._center)
+        self._center.append(center)
+        self._left.append(-1)
+        self._right.append(-1)
+        order = np.argsort(lows[here], kind="stable")
+        self._by_low.append(here[order])
+        self._lows.append(lows[here][order])
+        order = np.argsort(highs[here], kind="stable")
+        self._by_high.append(here[order])
+        self._highs.append(highs[here][order])
+        if below.any():
+            self._left[node] = self._build(ids[below], lows, highs)
+        if above.any():
+            self._right[node] = self._build(ids[above], lows, highs)
+        return node
+
+    def __len__(self):
+        return self.size
+
+    def covering(self, point):
+        # Sorted positions of every range with low <= point <= high
+        found = []
+        node = 0 if self._center else -1
+        while node >= 0:
+            center = self._center[node]
+            if point < center: # Ranges here end at or after the center; keep those starting at or before the point
+                found.append(self._by_low[node][:np.searchsorted(self._lows[node], point, side="right")])
+                node = self._left[node]
+            elif point > center: # Ranges here start at or before the center; keep those ending at or after the point
+                found.append(self._by_high[node][np.searchsorted(self._highs[node], point, side="left"):])
+                node = self._right[node]
+            else:
+                found.append(self._by_low[node])
+                break
+        return np.sort(np.concatenate(found)) if found else np.empty(0, dtype=np.intp)
@@ -0,0 +1,270 @@
+import argparse
+import csv
+import io
+import math
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# Plotly's default colour sequence, so the images match the page's geometry chart
+COLORS = ("#636EFA", "#EF553B", "#00CC96", "#AB63FA", "#FFA15A", "#19D3F3", "#FF6692", "#B6E880", "#FF97FF", "#FECB52")
+GRID_COLOR = "#E5ECF6"
+AXIS_COLOR = "#444444"
+TITLE = "Scaled Rectangle Dimensions (1:20 mm)"
+X_TITLE = "X Coordinate (mm)"
+Y_TITLE = "Y Coordinate (mm)"
+LEGEND_WIDTH = 150 # Room on the right for the legend when units are labelled
+MARGIN = (40, 20, 56, 64) # Top, right, bottom, left: title, padding, x ticks + title, y ticks + title
+
+
+def _font(size):
+    try:
+        return ImageFont.load_default(size)
+    except TypeError: # Pillow < 10.1 only has the fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+def nice_ticks(low, high, count=5):
+    # Round tick values (steps of 1, 2 or 5 x 10^n) covering [low, high]
+    span = high - low
+    if not np.isfinite(span) or span <= 0:
+        return np.array([low]) if np.isfinite(low) else np.empty(0)
+    raw = span / count
+    magnitude = 10 ** math.floor(math.log10(raw))
+    step = next(m * magnitude for m in (1, 2, 5, 10) if m * magnitude >= raw)
+    return np.arange(math.ceil(low / step) * step, high + step * 1e-9, step)
+
+
+def _segments(valid):
+    # (start, end) of each run of valid points; a missing point breaks the outline like on the page
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], valid.astype(np.int8), [0]])))
+    return list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+
+class FootprintRenderer:
+    # Draws unit outlines (rows x points arrays, as in geometry.GeometryTable) straight to
+    # PNG with Pillow or to SVG text, without Plotly or a browser. Pixel positions of all
+    # outlines are computed in one numpy pass with equal X/Y scales, either in one shared
+    # frame (a comparison) or in a frame per outline (pre-rendering every row)
+
+    def __init__(self, width=640, height=420, markers=True, colors=COLORS, font_size=12):
+        self.width = width
+        self.height = height
+        self.markers = markers
+        self.colors = colors
+        self.font_size = font_size
+        self._load_fonts()
+
+    def _load_fonts(self):
+        self._font = _font(self.font_size)
+        self._title_font = _font(self.font_size + 4)
+
+    def __getstate__(self):
+        # Loaded fonts don't pickle; worker processes load their own
+        return {name: value for name, value in self.__dict__.items() if name not in ("_font", "_title_font")}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._load_fonts()
+
+    def _plot_area(self, legend):
+        top, right, bottom, left = MARGIN
+        return left, top, self.width - right - (LEGEND_WIDTH if legend else 0), self.height - bottom
+
+    def layout(self, x, y, legend=False, shared=True):
+        # Pixel coordinates of the outline points plus the data range of the plot area per frame
+        # ((frames x 4) array of x0, x1, y0, y1). shared=False fits every row into its own frame
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        axis = None if shared else 1
+        if shared and not (~np.isnan(x) & ~np.isnan(y)).any():
+            # Nothing to draw (no outline, or none with coordinates): an empty chart around 0
+            x0 = x1 = y0 = y1 = np.zeros((1, 1))
+        else:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning) # All-NaN rows are left out of the drawing anyway
+                x0, x1 = np.nanmin(x, axis=axis, keepdims=True), np.nanmax(x, axis=axis, keepdims=True)
+                y0, y1 = np.nanmin(y, axis=axis, keepdims=True), np.nanmax(y, axis=axis, keepdims=True)
+        # 5% padding, and a unit range for degenerate (single point or line) outlines
+        pad_x = np.where(x1 > x0, (x1 - x0) * 0.05, 0.5)
+        pad_y = np.where(y1 > y0, (y1 - y0) * 0.05, 0.5)
+        x0, x1, y0, y1 = x0 - pad_x, x1 + pad_x, y0 - pad_y, y1 + pad_y
+        left, top, right, bottom = self._plot_area(legend)
+        # One scale for both axes (the page's chart anchors Y to X); the outline is centred in the other axis
+        scale = np.minimum((right - left) / (x1 - x0), (bottom - top) / (y1 - y0))
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        half_w, half_h = (right - left) / 2 / scale, (bottom - top) / 2 / scale
+        px = (left + right) / 2 + (x - cx) * scale
+        py = (top + bottom) / 2 - (y - cy) * scale # Pixel rows grow downwards
+        frames = np.hstack([np.reshape(v, (-1, 1)) for v in (cx - half_w, cx + half_w, cy - half_h, cy + half_h)])
+        return px, py, frames
+
+    def _axes(self, frame, legend):
+        # Grid lines and tick labels as ((x0, y0, x1, y1) lines, [(x, y, text, anchor)] labels) in pixels
+        left, top, right, bottom = self._plot_area(legend)
+        d_x0, d_x1, d_y0, d_y1 = frame
+        lines, labels = [], []
+        for value in nice_ticks(d_x0, d_x1):
+            px = left + (value - d_x0) / (d_x1 - d_x0) * (right - left)
+            lines.append((px, top, px, bottom))
+            labels.append((px, bottom + 4, f"{value:g}", "mt"))
+        for value in nice_ticks(d_y0, d_y1):
+            py = bottom - (value - d_y0) / (d_y1 - d_y0) * (bottom - top)
+            lines.append((left, py, right, py))
+            labels.append((left - 6, py, f"{value:g}", "rm"))
+        return lines, labels
+
+    def _color(self, i):
+        return self.colors[i % len(self.colors)]
+
+    def _draw_png(self, px, py, frame, labels, title):
+        image = Image.new("RGB", (self.width, self.height), "white")
+        draw = ImageDraw.Draw(image)
+        legend = labels is not None
+        left, top, right, bottom = self._plot_area(legend)
+        lines, ticks = self._axes(frame, legend)
+        for line in lines:
+            draw.line(line, fill=GRID_COLOR, width=1)
+        draw.rectangle((left, top, right, bottom), outline=AXIS_COLOR)
+        for tx, ty, text, anchor in ticks:
+            draw.text((tx, ty), text, fill=AXIS_COLOR, font=self._font, anchor=anchor)
+        draw.text(((left + right) / 2, self.height - 6), X_TITLE, fill=AXIS_COLOR, font=self._font, anchor="md")
+        y_title = Image.new("L", (bottom - top, self.font_size + 6), 0)
+        ImageDraw.Draw(y_title).text(((bottom - top) / 2, 0), Y_TITLE, fill=255, font=self._font, anchor="mt")
+        image.paste(AXIS_COLOR, (4, top), y_title.rotate(90, expand=True))
+        if title:
+            draw.text((left, 10), title, fill="black", font=self._title_font)
+
+        for i in range(len(px)):
+            color = self._color(i)
+            valid = ~np.isnan(px[i])
+            for start, end in _segments(valid):
+                points = list(zip(px[i, start:end].tolist(), py[i, start:end].tolist()))
+                if len(points) > 1:
+                    draw.line(points, fill=color, width=2, joint="curve")
+            if self.markers:
+                for mx, my in zip(px[i, valid].tolist(), py[i, valid].tolist()):
+                    draw.ellipse((mx - 3, my - 3, mx + 3, my + 3), fill=color)
+        if legend:
+            for i, label in enumerate(labels):
+                ly = top + 8 + i * (self.font_size + 8)
+                draw.line((right + 12, ly, right + 32, ly), fill=self._color(i), width=3)
+                draw.text((right + 38, ly), str(label), fill="black", font=self._font, anchor="lm")
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG", compress_level=1) # Flat drawings compress well even at the fastest level
+        return buffer.getvalue()
+
+    def _draw_svg(self, px, py, frame, labels, title):
+        legend = labels is not None
+        left, top, right, bottom = self._plot_area(legend)
+        lines, ticks = self._axes(frame, legend)
+        anchors = {"m": "middle", "r": "end", "l": "start"}
+        baselines = {"t": "hanging", "m": "middle", "d": "auto"}
+        parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{self.width}" height="{self.height}" '
+                 f'viewBox="0 0 {self.width} {self.height}" font-family="sans-serif" font-size="{self.font_size}">',
+                 f'<rect width="{self.width}" height="{self.height}" fill="white"/>']
+        parts += [f'<line x1="{x0:.1f}" y1="{y0:.1f}" x2="{x1:.1f}" y2="{y1:.1f}" stroke="{GRID_COLOR}"/>'
+                  for x0, y0, x1, y1 in lines]
+        parts.append(f'<rect x="{left}" y="{top}" width="{right - left}" height="{bottom - top}" fill="none" stroke="{AXIS_COLOR}"/>')
+        parts += [f'<text x="{tx:.1f}" y="{ty:.1f}" text-anchor="{anchors[anchor[0]]}" dominant-baseline="{baselines[anchor[1]]}" '
+                  f'fill="{AXIS_COLOR}">{escape(text)}</text>' for tx, ty, text, anchor in ticks]
+        parts.append(f'<text x="{(left + right) / 2:.1f}" y="{self.height - 6}" text-anchor="middle" fill="{AXIS_COLOR}">{X_TITLE}</text>')
+        parts.append(f'<text transform="translate(14 {(top + bottom) / 2:.1f}) rotate(-90)" text-anchor="middle" '
+                     f'fill="{AXIS_COLOR}">{Y_TITLE}</text>')
+        if title:
+            parts.append(f'<text x="{left}" y="24" font-size="{self.font_size + 4}">{escape(title)}</text>')
+
+        for i in range(len(px)):
+            color = self._color(i)
+            valid = ~np.isnan(px[i])
+            path = " ".join(
+                "M" + " L".join(f"{mx:.1f} {my:.1f}" for mx, my in zip(px[i, start:end].tolist(), py[i, start:end].tolist()))
+                for start, end in _segments(valid))
+            if path:
+                parts.append(f'<path d="{path}" fill="none" stroke="{color}" stroke-width="2" stroke-linejoin="round"/>')
+            if self.markers:
+                parts += [f'<circle cx="{mx:.1f}" cy="{my:.1f}" r="3" fill="{color}"/>'
+                          for mx, my in zip(px[i, valid].tolist(), py[i, valid].tolist())]
+        if legend:
+            for i, label in enumerate(labels):
+                ly = top + 8 + i * (self.font_size + 8)
+                parts.append(f'<line x1="{right + 12}" y1="{ly}" x2="{right + 32}" y2="{ly}" stroke="{self._color(i)}" stroke-width="3"/>')
+                parts.append(f'<text x="{right + 38}" y="{ly}" dominant-baseline="middle">{escape(str(label))}</text>')
+        parts.append("</svg>")
+        return "\n".join(parts).encode("utf-8")
+
+    def render(self, x, y, labels=None, fmt="png", title=TITLE):
+        # One image of several outlines in a shared frame (the comparison chart); PNG or SVG bytes
+        px, py, frames = self.layout(x, y, legend=labels is not None)
+        draw = self._draw_svg if fmt == "svg" else self._draw_png
+        return draw(px, py, frames[0], labels, title)
+
+    def render_each(self, x, y, fmt="png", titles=None):
+        # One image per outline, each fitted to its own frame; yields (row index, bytes).
+        # The layout of all outlines is one numpy pass, only the drawing is per image
+        px, py, frames = self.layout(x, y, shared=False)
+        draw = self._draw_svg if fmt == "svg" else self._draw_png
+        for i in range(len(px)):
+            yield i, draw(px[i:i + 1], py[i:i + 1], frames[i], None, titles[i] if titles is not None else None)
+
+
+def _render_files(renderer, x, y, fmt, titles, paths):
+    # Runs in a worker process for pre-rendering: one file per outline of the chunk
+    for i, data in renderer.render_each(x, y, fmt, titles):
+        with open(paths[i], "wb") as fh:
+            fh.write(data)
+    return len(paths)
+
+
+def prerender_catalog(engine, out_dir, fmt="png", renderer=None, workers=None, chunk_size=256):
+    # Footprint image of every drawable row of an engine's frame, named by row position, plus an
+    # index.csv mapping each file to the row's selection key. Chunks of rows are rendered in
+    # parallel (workers=1 renders in this process). Returns the number of images written
+    renderer = renderer or FootprintRenderer()
+    os.makedirs(out_dir, exist_ok=True)
+    rows = np.flatnonzero(engine.geometry.drawable)
+    keys = engine.row_keys(rows.tolist())
+    titles = [" / ".join(str(value) for value in key[3:]) for key in keys]
+    names = [f"{row:06d}.{fmt}" for row in rows.tolist()]
+    paths = [os.path.join(out_dir, name) for name in names]
+    chunks = [(renderer, engine.geometry.x[rows[i:i + chunk_size]], engine.geometry.y[rows[i:i + chunk_size]], fmt,
+               titles[i:i + chunk_size], paths[i:i + chunk_size]) for i in range(0, len(rows), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            _render_files(*chunk)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(_render_files, *chunk) for chunk in chunks]:
+                future.result()
+
+    with open(os.path.join(out_dir, "index.csv"), "w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["row", "Year", "Quarter", "Region", "Brand", "Unit name", "Recovery type", "Unit size", "file"])
+        writer.writerows([row, *key, name] for row, key, name in zip(rows.tolist(), keys, names))
+    return len(rows)
+
+
+if __name__ == "__main__":
+    # Build step: pre-render the footprint of every row of a workbook
+    import comparison_engine
+
+    parser = argparse.ArgumentParser(description="Render the footprint outline of every catalogue row to PNG or SVG.")
+    parser.add_argument("workbook", nargs="?", default="Data_2025.xlsx")
+    parser.add_argument("--out-dir", default="footprints")
+    parser.add_argument("--format", choices=["png", "svg"], default="png")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=420)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    engine = comparison_engine.ComparisonEngine.from_workbook(args.workbook)
+    start = time.perf_counter()
+    count = prerender_catalog(engine, args.out_dir, args.format, FootprintRenderer(args.width, args.height), args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"Rendered {count} footprints to {args.out_dir} in {elapsed:.2f} s "
+          f"({elapsed * 1000.0 / max(count, 1):.2f} ms per image)")
@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# Drawings in the workbook are in mm and shown at 1:20
+SCALE = 20.0
+# The workbook provides up to 15 outline points per unit (x1..x15, y1..y15)
+MAX_POINTS = 15
+
+
+def coordinate_arrays(rows, coord_col_pairs, scale=SCALE):
+    # (rows x points) float arrays of scaled X and Y values for all selected rows at once.
+    # A point missing either coordinate is NaN in both arrays, which breaks the outline there
+    x_cols = [x_name for x_name, _ in coord_col_pairs]
+    y_cols = [y_name for _, y_name in coord_col_pairs]
+    x = rows[x_cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float) / scale
+    y = rows[y_cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float) / scale
+    missing = np.isnan(x) | np.isnan(y)
+    x[missing] = np.nan
+    y[missing] = np.nan
+    return x, y
+
+
+class GeometryTable:
+    # Outlines of every row converted once at load time into a tidy long-form
+    # table (row_id, Point_Order, X_coord, Y_coord), already scaled 1:20 and
+    # sorted by row id and point order. Every row owns exactly n_points
+    # consecutive entries, so a chart is a positional slice of this table
+
+    def __init__(self, df, coord_col_pairs, scale=SCALE):
+        self._set_arrays(*coordinate_arrays(df, coord_col_pairs, scale))
+
+    def _set_arrays(self, x, y):
+        n_rows, self.n_points = x.shape
+        # Row ids are positions in the loaded frame (the same positions the selection index returns)
+        self.table = pd.DataFrame({
+            "row_id": np.repeat(np.arange(n_rows), self.n_points),
+            "Point_Order": np.tile(np.arange(1, self.n_points + 1), n_rows),
+            "X_coord": x.ravel(),
+            "Y_coord": y.ravel(),
+        })
+        # (rows x points) views of the same values for whole-outline slicing
+        self.x = self.table["X_coord"].to_numpy().reshape(n_rows, self.n_points)
+        self.y = self.table["Y_coord"].to_numpy().reshape(n_rows, self.n_points)
+        # A unit needs at least two valid points to be drawn
+        self.drawable = (~np.isnan(x)).sum(axis=1) >= 2
+
+    def __len__(self):
+        return len(self.drawable)
+
+    def patched(self, df, coord_col_pairs, reuse, scale=SCALE):
+        # Table for an updated frame (same coordinate columns): reuse[i] is the row of this
+        # table holding row i's unchanged outline, or -1 for rows to convert from df.
+        # Returns a new table; this one is left as it is
+        reuse = np.asarray(reuse, dtype=np.intp)
+        kept = reuse >= 0
+        x = np.empty((len(df), self.n_points))
+        y = np.empty((len(df), self.n_points))
+        x[kept] = self.x[reuse[kept]]
+        y[kept] = self.y[reuse[kept]]
+        dirty = np.flatnonzero(~kept)
+        if len(dirty):
+            x[dirty], y[dirty] = coordinate_arrays(df.iloc[dirty], coord_col_pairs, scale)
+        table = GeometryTable.__new__(GeometryTable)
+        table._set_arrays(x, y)
+        return table
+
+    @classmethod
+    def stacked(cls, parts):
+        # Table of a few rows taken from several tables, [(table, row ids)], in that order.
+        # Tables with fewer outline points are padded with missing points
+        n_points = max((table.n_points for table, _ in parts), default=0)
+        xs, ys = [np.empty((0, n_points))], [np.empty((0, n_points))]
+        for table, row_ids in parts:
+            row_ids = np.asarray(row_ids, dtype=np.intp)
+            pad = ((0, 0), (0, n_points - table.n_points))
+            xs.append(np.pad(table.x[row_ids], pad, constant_values=np.nan))
+            ys.append(np.pad(table.y[row_ids], pad, constant_values=np.nan))
+        table = cls.__new__(cls)
+        table._set_arrays(np.vstack(xs), np.vstack(ys))
+        return table
+
+    def chart_frame(self, row_ids, labels):
+        # Chart data (X_coord, Y_coord, Source, Point_Order) for the given rows,
+        # labelled per row. Returns (frame, plotted labels, skipped labels)
+        row_ids = np.asarray(row_ids, dtype=np.intp)
+        labels = np.asarray(labels, dtype=object)
+        drawable = self.drawable[row_ids]
+        plotted_ids = row_ids[drawable]
+
+        entries = (plotted_ids[:, None] * self.n_points + np.arange(self.n_points)).ravel()
+        frame = self.table.iloc[entries, 1:].reset_index(drop=True)
+        frame["Source"] = np.repeat(labels[drawable], self.n_points)
+        return frame[["X_coord", "Y_coord", "Source", "Point_Order"]], list(labels[drawable]), list(labels[~drawable])
+
+    def separated_outlines(self, row_ids):
+        # X and Y of several outlines joined into flat arrays with a NaN after each
+        # outline, so they can be drawn as one trace (NaN is sent as null / a line break)
+        row_ids = np.asarray(row_ids, dtype=np.intp)
+        row_ids = row_ids[self.drawable[row_ids]]
+        separator = np.full((len(row_ids), 1), np.nan)
+        x = np.hstack([self.x[row_ids], separator]).ravel()
+        y = np.hstack([self.y[row_ids], separator]).ravel()
+        return x, y, row_ids
+
+
+def build_footprint_figure(chart_df, markers=True, hovermode="x unified"):
+    # Line chart of the unit outlines, one colour per source, equal axis scales
+    fig = px.line(chart_df,
+                  x="X_coord",
+                  y="Y_coord",
+                  color="Source",
+                  line_group="Source", # Group lines by source
+                  markers=markers, # Show markers at data points
+                  title="Scaled Rectangle Dimensions (1:20 mm)")
+
+    # Update layout for better visualization
+    fig.update_layout(
+        xaxis_title="X Coordinate (mm)",
+        yaxis_title="Y Coordinate (mm)",
+        hovermode=hovermode,
+        legend_title_text="Brand",
+        xaxis_constrain="domain", # Keeps aspect ratio better
+        yaxis_constrain="domain", # Keeps aspect ratio better
+        showlegend=True
+    )
+
+    # Ensure the aspect ratio is equal if it's a drawing
+    fig.update_yaxes(scaleanchor="x", scaleratio=1)
+    return fig
+
+
+def build_overlay_figure(geometry_table, groups):
+    # Overlay of many outlines drawn with WebGL traces: one trace per group
+    # (e.g. per brand) holding all of its outlines separated by gaps, instead
+    # of one trace per polygon. groups: [(trace name, row ids, hover label per row)]
+    fig = go.Figure()
+    for name, row_ids, row_labels in groups:
+        label_by_row = dict(zip(np.asarray(row_ids, dtype=np.intp).tolist(), row_labels))
+        x, y, drawn_ids = geometry_table.separated_outlines(row_ids)
+        if not len(drawn_ids):
+            continue
+        # Every point (and the separator) of an outline carries that outline's label
+        text = np.repeat([str(label_by_row[row_id]) for row_id in drawn_ids.tolist()], geometry_table.n_points + 1)
+        fig.add_trace(go.Scattergl(
+            x=x, y=y, text=text, name=str(name),
+            mode="lines+markers", marker={"size": 4},
+            hovertemplate="%{text}<br>X: %{x}<br>Y: %{y}<extra>%{fullData.name}</extra>",
+        ))
+
+    fig.update_layout(
+        title="Scaled Rectangle Dimensions, all sizes (1:20 mm)",
+        xaxis_title="X Coordinate (mm)",
+        yaxis_title="Y Coordinate (mm)",
+        hovermode="closest", # Unified x hover is slow with many overlaid points
+        legend_title_text="Brand",
+        xaxis_constrain="domain",
+        yaxis_constrain="domain",
+        showlegend=True
+    )
+    fig.update_yaxes(scaleanchor="x", scaleratio=1)
+    return fig
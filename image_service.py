@@ -0,0 +1,129 @@
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+
+class ImageManifest:
+    # Reads the manifest written by build_image_variants.py and picks the
+    # smallest pre-built variant that still fits a requested display width.
+    # The file is re-read whenever its mtime changes
+
+    def __init__(self, path, formats=("webp", "png")):
+        self.path = path
+        self.formats = formats
+        self._mtime_ns = None
+        self._images = {}
+
+    def _refresh(self):
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except OSError:
+            self._mtime_ns, self._images = None, {}
+            return
+        if mtime_ns != self._mtime_ns:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                self._images = json.load(fh).get("images", {})
+            self._mtime_ns = mtime_ns
+
+    def best_variant(self, images_dir, name, width):
+        # Returns (path, variant width) or None when there is no usable variant.
+        # Variants of a source file that changed after the build are ignored
+        self._refresh()
+        entry = self._images.get(name)
+        if not entry:
+            return None
+        try:
+            if os.stat(os.path.join(images_dir, name)).st_mtime_ns != entry.get("mtime_ns"):
+                return None
+        except OSError:
+            return None
+
+        for fmt in self.formats:
+            candidates = sorted((v for v in entry["variants"] if v["format"] == fmt), key=lambda v: v["width"])
+            if not candidates:
+                continue
+            # Smallest variant at least as wide as the target, else the largest available
+            chosen = next((v for v in candidates if v["width"] >= width), candidates[-1])
+            path = os.path.join(images_dir, chosen["path"]) # Manifest paths are relative to images_dir
+            if os.path.exists(path):
+                return path, chosen["width"]
+        return None
+
+
+class ImageService:
+    # Decodes each image once and keeps the encoded (optionally resized) image
+    # bytes in a bounded LRU cache keyed by path, mtime and target width.
+    # st.image accepts the bytes directly, so a cache hit does no PIL work at all
+
+    def __init__(self, max_entries=64, manifest=None):
+        self.max_entries = max_entries
+        self.manifest = manifest # Optional ImageManifest of pre-built web variants
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, width=None):
+        # width=None returns the file bytes unchanged; otherwise the image is resized
+        # to that width (height follows the aspect ratio) and encoded as PNG
+        key = (os.path.abspath(path), os.stat(path).st_mtime_ns, width)
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return data
+            self.misses += 1
+
+        data = self._render(path, width)
+
+        with self._lock:
+            self._cache[key] = data
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+        return data
+
+    def get_fitted(self, images_dir, name, width, exact=False):
+        # Serve the smallest pre-built variant that fits `width`. With exact=True
+        # the result is resized to exactly `width` (fixed-size logos); without a
+        # usable variant the original file is used
+        variant = self.manifest.best_variant(images_dir, name, width) if self.manifest else None
+        if variant:
+            path, variant_width = variant
+            return self.get(path, width if exact and variant_width != width else None)
+        return self.get(os.path.join(images_dir, name), width if exact else None)
+
+    def _render(self, path, width):
+        if not width:
+            # No resize needed: send the file as stored, without decoding it
+            with open(path, "rb") as fh:
+                return fh.read()
+        with Image.open(path) as image:
+            image.load()
+            if image.width != width:
+                height = max(1, int(image.height * (width / image.width))) # Maintain aspect ratio
+                image = image.resize((width, height))
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG", optimize=True)
+        return buffer.getvalue()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._cache),
+                "bytes": sum(len(data) for data in self._cache.values()),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
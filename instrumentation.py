@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Set AHU_PROFILING=1 to collect stage timings from server start
+ENV_FLAG = "AHU_PROFILING"
+
+
+class _NullSpan:
+    # Shared no-op context manager returned while profiling is off
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "started")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, time.perf_counter() - self.started)
+        return False
+
+
+def _quantile(ordered, q):
+    # Nearest-rank quantile of an already sorted list
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))]
+
+
+class Profiler:
+    # Timing spans per named stage, aggregated across all sessions of the
+    # server. Each stage keeps its total count/sum and the most recent
+    # `window` samples for p50/p95. When disabled, span() returns a shared
+    # no-op object, so the instrumented code pays one attribute check
+
+    def __init__(self, enabled=None, window=2048):
+        self.enabled = os.environ.get(ENV_FLAG, "") == "1" if enabled is None else enabled
+        self.window = window
+        self._samples = {}
+        self._counts = {}
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def span(self, name):
+        return _Span(self, name) if self.enabled else _NULL_SPAN
+
+    def start(self):
+        # For stages that can't be wrapped in a with-block: pass the result to stop()
+        return time.perf_counter() if self.enabled else None
+
+    def stop(self, name, started):
+        if started is not None:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name, seconds):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+                self._counts[name] = 0
+                self._totals[name] = 0.0
+            samples.append(seconds)
+            self._counts[name] += 1
+            self._totals[name] += seconds
+
+    def _snapshot(self):
+        # {stage: (sorted window samples, count, total seconds)}, copied under the lock
+        with self._lock:
+            return {name: (sorted(samples), self._counts[name], self._totals[name])
+                    for name, samples in self._samples.items() if samples}
+
+    def summary(self):
+        # {stage: {count, p50_ms, p95_ms, mean_ms, total_ms}} in first-seen order
+        return {
+            name: {
+                "count": count,
+                "p50_ms": round(_quantile(ordered, 0.50) * 1000.0, 3),
+                "p95_ms": round(_quantile(ordered, 0.95) * 1000.0, 3),
+                "mean_ms": round(total / count * 1000.0, 3),
+                "total_ms": round(total * 1000.0, 3),
+            }
+            for name, (ordered, count, total) in self._snapshot().items()
+        }
+
+    def to_json(self, extra=None):
+        # Stage summary plus optional extra sections (e.g. cache counters)
+        payload = {"generated_at": time.time(), "enabled": self.enabled, "stages": self.summary()}
+        payload.update(extra or {})
+        return json.dumps(payload, indent=2)
+
+    def to_prometheus(self, metric="ahu_app_stage_seconds"):
+        # Prometheus text exposition: one summary per stage with p50/p95 quantiles
+        lines = [f"# HELP {metric} Duration of app render stages.", f"# TYPE {metric} summary"]
+        for name, (ordered, count, total) in self._snapshot().items():
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            for q in (0.5, 0.95):
+                lines.append(f'{metric}{{stage="{label}",quantile="{q}"}} {_quantile(ordered, q):.9f}')
+            lines.append(f'{metric}_sum{{stage="{label}"}} {total:.9f}')
+            lines.append(f'{metric}_count{{stage="{label}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counts.clear()
+            self._totals.clear()
@@ -0,0 +1,68 @@
+import logging
+import threading
+import time
+
+import data_cache
+
+logger = logging.getLogger(__name__)
+
+
+class WorkbookWatcher:
+    # Polls the version (mtime + size) of one or more workbooks from a daemon thread and
+    # calls on_change(path, version) once a file has changed and stopped changing. Errors
+    # (missing or half-written file) are logged and the file is checked again next poll.
+    # discover(), when given, returns the current list of workbooks so new files are picked up
+
+    def __init__(self, paths, on_change, versions=None, poll_seconds=5.0, settle_seconds=1.0, discover=None):
+        self.paths = list(paths)
+        self.on_change = on_change
+        self.discover = discover
+        self.poll_seconds = poll_seconds
+        self.settle_seconds = settle_seconds
+        # Last version handled per path; callers pass the versions they already loaded
+        self._versions = dict(versions or {})
+        self._stop = threading.Event()
+        self._thread = None
+
+    def watch(self, path, version=None):
+        # Add a workbook (e.g. a new period file) to the polled set
+        if path not in self.paths:
+            self.paths.append(path)
+        if version is not None:
+            self._versions[path] = version
+
+    def check(self, path):
+        # True when on_change was called for a new version of `path`
+        version = data_cache.file_version(path)
+        if version == self._versions.get(path):
+            return False
+        # Excel and copy tools write the file in several steps: wait until it stops changing
+        time.sleep(self.settle_seconds)
+        if data_cache.file_version(path) != version:
+            return False # Still being written, try again on the next poll
+        self.on_change(path, version)
+        self._versions[path] = version
+        return True
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="workbook-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.poll_seconds):
+            if self.discover is not None:
+                for path in self.discover():
+                    self.watch(path)
+            for path in list(self.paths):
+                try:
+                    self.check(path)
+                except Exception as e:
+                    # Keep serving the version already loaded
+                    logger.warning("Could not reload %s: %s", path, e)
+
@@ -0,0 +1,107 @@
+"""Typed description of the catalogue's technical parameters.
+
+Each parameter has a display unit, a dtype ("number", "flag" or "text") and,
+for numbers, whether a higher value is better. The schema is resolved once
+per loaded frame, so comparisons can select all numeric parameters of the
+selected units as one float matrix and compute their differences together.
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+NUMBER = "number"
+FLAG = "flag"
+TEXT = "text"
+
+
+@dataclass(frozen=True)
+class Parameter:
+    name: str
+    unit: Optional[str] = None
+    dtype: str = NUMBER
+    higher_is_better: Optional[bool] = None # None: neither direction is better (sizes, counts)
+
+    @property
+    def label(self) -> str:
+        return f"{self.name} [{self.unit}]" if self.unit else self.name
+
+
+def _numbers(unit: Optional[str], higher_is_better: Optional[bool], *names: str) -> List[Parameter]:
+    return [Parameter(name, unit, NUMBER, higher_is_better) for name in names]
+
+
+# Known parameters of Data_2025.xlsx. Columns not listed get their dtype from the loaded frame and no unit
+PARAMETERS: Dict[str, Parameter] = {parameter.name: parameter for parameter in [
+    *_numbers("m³/h", True, "Maximum airflow", "Maximum airflow (ErP2018)"),
+    *_numbers("m³/h", False, "Minimum airflow"),
+    *_numbers("m/s", False, "Air speed on Filter at max airflow (ErP)"),
+    *_numbers("mm", None, "Internal Width (Supply Filter)", "Internal Height (Supply Filter)",
+              "Internal Width (Supply Fan)", "Internal Height (Supply Fan)", "Duct connection Width",
+              "Duct connection Height", "Duct connection Diameter", "Wheel diameter", "Impeller size"),
+    *_numbers("m²", None, "Unit cross section area (Supply Filter)", "Unit cross section area (Supply Fan)"),
+    *_numbers("mm", True, "Insulation thickness", "Metal sheet thickness (Internal)", "Metal sheet thickness (External)"),
+    *_numbers("mm", None, "Distance between lamels"),
+    *_numbers("%", True, "Efficiency at nominal balanced airflows", "Efficiency at max balanced airflows",
+              "Impeller efficiency at nominal airflow", "Filtration efficiency_typ1", "Filtration efficiency_typ2"),
+    *_numbers("kW", None, "Motor rated power", "Capacity range1", "Capacity range2", "Capacity range3"),
+    *_numbers("Pa", False, "Initial PD at nominal airflow_typ1", "Initial PD at nominal airflow_typ2",
+              "Final PD_typ1", "Final PD_typ2"),
+    *_numbers(None, None, "Unit size quantity", "Motor quantity", "Water heater_min rows", "Water heater_max rows",
+              "Water cooler_min rows", "Water cooler_max rows", "DXH_min rows", "DXH_max rows", "DXH sections range"),
+]}
+
+# Columns derived from a listed parameter keep its unit: range bounds split by dtype_schema
+# ("Minimum airflow (min)") and repeated headers renamed by pandas ("... airflows.1")
+_DERIVED_SUFFIX = re.compile(r"( \((?:min|max)\)|\.\d+)$")
+
+
+class ParameterSet:
+    """Parameters of the displayed columns of one loaded frame, in column order."""
+
+    def __init__(self, parameters: Iterable[Parameter]):
+        self.parameters: Dict[str, Parameter] = {parameter.name: parameter for parameter in parameters}
+        self.numeric: List[str] = [name for name, p in self.parameters.items() if p.dtype == NUMBER]
+
+    @classmethod
+    def resolve(cls, df: pd.DataFrame, excluded_cols: Sequence[Optional[str]] = (),
+                known: Dict[str, Parameter] = PARAMETERS) -> "ParameterSet":
+        excluded = {col for col in excluded_cols if col is not None}
+        parameters = []
+        for col in df.columns:
+            if col in excluded:
+                continue
+            series = df[col]
+            if pd.api.types.is_bool_dtype(series):
+                dtype = FLAG
+            elif pd.api.types.is_numeric_dtype(series):
+                dtype = NUMBER
+            else:
+                dtype = TEXT # Text, categoricals and columns that mix text and numbers
+            base = known.get(col) or known.get(_DERIVED_SUFFIX.sub("", str(col)))
+            if base is None:
+                parameters.append(Parameter(col, None, dtype))
+            else:
+                # The loaded dtype wins: a listed number column that still holds text can't be subtracted
+                parameters.append(Parameter(col, base.unit, dtype, base.higher_is_better if dtype == NUMBER else None))
+        return cls(parameters)
+
+    def __getitem__(self, name: str) -> Parameter:
+        return self.parameters[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.parameters
+
+    def labels(self, names: Sequence[str]) -> List[str]:
+        # Display label with unit, e.g. "Maximum airflow [m³/h]"
+        return [self.parameters[name].label if name in self.parameters else name for name in names]
+
+    def directions(self, names: Sequence[str]) -> np.ndarray:
+        # +1 where higher is better, -1 where lower is better, 0 where neither
+        return np.array([
+            0 if name not in self.parameters or self.parameters[name].higher_is_better is None
+            else (1 if self.parameters[name].higher_is_better else -1)
+            for name in names
+        ], dtype=np.int8)
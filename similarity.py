@@ -0,0 +1,123 @@
+import heapq
+
+import numpy as np
+import pandas as pd
+
+# Parameters that describe what a unit can do; units are compared on these after normalization.
+# The airflow range and internal height are added by the engine under their resolved column
+# names (ColumnMap), which change when dtype_schema splits range cells
+DEFAULT_FEATURES = (
+    "Internal Width (Supply Fan)",
+    "Efficiency at nominal balanced airflows",
+    "Motor rated power",
+)
+
+
+def feature_values(df, col):
+    # A feature column as floats. Repeated headers are loaded as "name.1", "name.2", ...; the
+    # efficiencies of HEX units are in "... .1" with 0 in the first column, RRG units the other
+    # way round. Per row, the first non-zero value of the column and its repeats is used
+    cols = [col]
+    while f"{col}.{len(cols)}" in df.columns:
+        cols.append(f"{col}.{len(cols)}")
+    values = df[cols].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    if len(cols) == 1:
+        return values[:, 0]
+    usable = ~np.isnan(values) & (values != 0)
+    first = np.where(usable.any(axis=1), usable.argmax(axis=1), 0)
+    return values[np.arange(len(values)), first]
+
+
+class KDTree:
+    # Static k-d tree over the rows of a float matrix. Nodes split the widest dimension at
+    # its median and keep their bounding box; leaves hold up to leaf_size points, which are
+    # scanned with numpy. Queries walk the nodes nearest-box first and stop once no box can
+    # beat the current k-th distance. An optional boolean mask restricts the candidates
+
+    def __init__(self, data, leaf_size=32):
+        self.data = np.asarray(data, dtype=float)
+        self.leaf_size = leaf_size
+        self._order = np.arange(len(self.data))
+        self._start, self._end, self._left, self._right, self._lo, self._hi = [], [], [], [], [], []
+        if len(self.data):
+            self._build(0, len(self.data))
+        self._lo = np.asarray(self._lo)
+        self._hi = np.asarray(self._hi)
+
+    def _build(self, start, end):
+        points = self.data[self._order[start:end]]
+        node = len(self._start)
+        self._start.append(start)
+        self._end.append(end)
+        self._left.append(-1)
+        self._right.append(-1)
+        self._lo.append(points.min(axis=0))
+        self._hi.append(points.max(axis=0))
+        if end - start > self.leaf_size:
+            dim = int(np.argmax(self._hi[node] - self._lo[node]))
+            mid = (start + end) // 2
+            # Points of the left child (below the median) come first in this node's range
+            self._order[start:end] = self._order[start:end][np.argpartition(points[:, dim], mid - start)]
+            self._left[node] = self._build(start, mid)
+            self._right[node] = self._build(mid, end)
+        return node
+
+    def _box_distance(self, node, point):
+        gap = np.maximum(self._lo[node] - point, 0.0) + np.maximum(point - self._hi[node], 0.0)
+        return float(gap @ gap)
+
+    def query(self, point, k=1, allowed=None):
+        # (distances, row indices) of the k nearest allowed rows, nearest first
+        point = np.asarray(point, dtype=float)
+        best_d = np.empty(0)
+        best_i = np.empty(0, dtype=np.intp)
+        if not len(self.data) or k <= 0:
+            return best_d, best_i
+        heap = [(self._box_distance(0, point), 0)]
+        while heap:
+            box_distance, node = heapq.heappop(heap)
+            if len(best_d) == k and box_distance > best_d[-1]:
+                break # No remaining box can hold a closer point
+            if self._left[node] >= 0:
+                for child in (self._left[node], self._right[node]):
+                    heapq.heappush(heap, (self._box_distance(child, point), child))
+                continue
+            rows = self._order[self._start[node]:self._end[node]]
+            if allowed is not None:
+                rows = rows[allowed[rows]]
+            if not len(rows):
+                continue
+            diff = self.data[rows] - point
+            distances = np.einsum("ij,ij->i", diff, diff)
+            best_d = np.concatenate([best_d, distances])
+            best_i = np.concatenate([best_i, rows])
+            keep = np.argsort(best_d, kind="stable")[:k]
+            best_d, best_i = best_d[keep], best_i[keep]
+        return np.sqrt(best_d), best_i
+
+
+class SimilarityIndex:
+    # Normalized feature matrix of a frame plus a k-d tree over its candidate rows
+    # (one row per selection key). Features are z-scores, with missing values set to
+    # the feature's median, so every feature weighs the same in the distance
+
+    def __init__(self, df, candidates, group_col, features=DEFAULT_FEATURES):
+        self.features = [col for col in features if col in df.columns]
+        values = np.column_stack([feature_values(df, col) for col in self.features] or [np.empty((len(df), 0))])
+        with np.errstate(all="ignore"): # All-missing features give NaN medians, replaced by 0 below
+            median = np.nan_to_num(np.nanmedian(values, axis=0)) if len(values) else np.zeros(len(self.features))
+        values = np.where(np.isnan(values), median, values)
+        std = values.std(axis=0)
+        self.matrix = (values - values.mean(axis=0)) / np.where(std > 0, std, 1.0)
+        self.candidates = np.asarray(candidates, dtype=np.intp)
+        self.groups = df[group_col].astype(object).to_numpy() if group_col else np.zeros(len(df), dtype=object)
+        self.tree = KDTree(self.matrix[self.candidates])
+
+    def nearest(self, position, k=5, other_groups=True):
+        # (row positions, distances) of the k candidates closest to the row at `position`,
+        # never the row itself and, with other_groups, only rows of other brands
+        allowed = self.candidates != position
+        if other_groups:
+            allowed &= self.groups[self.candidates] != self.groups[position]
+        distances, found = self.tree.query(self.matrix[position], k, allowed)
+        return self.candidates[found], distances
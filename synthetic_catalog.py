@@ -0,0 +1,218 @@
+import argparse
+import os
+import re
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+import comparison_engine
+import data_cache
+
+EXCEL_MAX_ROWS = 1_048_575 # Excel sheet limit minus the header row
+
+# Parameters that grow with the unit: linear dimensions scale with the size factor,
+# cross-section areas and the quantities that follow them (airflow, power) with its square
+LINEAR_PATTERN = re.compile(r"^[xy]\d+$|width|height|diameter|impeller size", re.IGNORECASE)
+SQUARE_PATTERN = re.compile(r"airflow|area|power", re.IGNORECASE)
+
+
+@dataclass
+class ColumnProfile:
+    name: str
+    kind: str # "key", "numeric" or "categorical"
+    values: np.ndarray # Distinct values (keys) or the value of every source row, missing ones included
+    integer: bool = False
+    scaling: int = 0 # 0: independent of size, 1: linear, 2: quadratic in the size factor
+
+
+@dataclass
+class CatalogSchema:
+    # Column order, per-column values and the observed dimension values of a workbook
+    columns: list
+    key_map: comparison_engine.ColumnMap
+    rows: int = 0 # Source rows the parameters are copied from
+    profiles: dict = field(default_factory=dict)
+    dimensions: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_frame(cls, df):
+        key_map = comparison_engine.ColumnMap.resolve(df)
+        key_cols = {col for col in key_map.key_cols + (key_map.logo, key_map.unit_photo) if col}
+        schema = cls(list(df.columns), key_map, len(df))
+        for col in df.columns:
+            series = df[col]
+            observed = series.dropna()
+            if col in key_cols:
+                schema.dimensions[col] = pd.unique(observed)
+                schema.profiles[col] = ColumnProfile(col, "key", np.asarray(pd.unique(observed), dtype=object))
+            elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                scaling = 2 if SQUARE_PATTERN.search(col) else 1 if LINEAR_PATTERN.search(col) else 0
+                schema.profiles[col] = ColumnProfile(
+                    col, "numeric", series.to_numpy(dtype=float, na_value=np.nan),
+                    integer=pd.api.types.is_integer_dtype(series), scaling=scaling,
+                )
+            else:
+                values = np.array(series.astype(object), dtype=object)
+                values[series.isna().to_numpy()] = None
+                schema.profiles[col] = ColumnProfile(col, "categorical", values)
+        return schema
+
+    @classmethod
+    def from_workbook(cls, path, sheet_name="data"):
+        # Profile the sheet as stored, not the normalized snapshot (load_sheet), so synthetic
+        # workbooks keep the source's text: "YES"/"NO" flags, range cells, numbers typed as text
+        return cls.from_frame(pd.read_excel(path, sheet_name=sheet_name, engine="openpyxl"))
+
+
+def _extend(observed, count, make_name):
+    # Observed values first, then synthetic names up to `count`
+    values = [value for value in observed][:count]
+    i = 1
+    while len(values) < count:
+        name = make_name(i)
+        if name not in values:
+            values.append(name)
+        i += 1
+    return np.asarray(values, dtype=object)
+
+
+def build_dimensions(schema, n_years=3, n_regions=6, n_brands=12, n_units=8, n_sizes=10):
+    # Value lists for every selection level; observed values are kept and extended
+    key_map = schema.key_map
+    dims = schema.dimensions
+    latest_year = int(max(dims.get(key_map.year, [2025])))
+    logos = list(dims.get(key_map.logo, [])) or [None]
+    photos = list(dims.get(key_map.unit_photo, [])) or [None]
+    brands = _extend(dims.get(key_map.brand, []), n_brands, lambda i: f"Brand {i:03d}")
+    units = _extend(dims.get(key_map.unit_name, []), n_units, lambda i: f"Series {i}")
+    return {
+        "years": np.arange(latest_year - n_years + 1, latest_year + 1),
+        "quarters": np.asarray(["Q1", "Q2", "Q3", "Q4"], dtype=object),
+        "regions": _extend(dims.get(key_map.region, []), n_regions, lambda i: f"R{i:02d}"),
+        "brands": brands,
+        "units": units,
+        "recoveries": np.asarray(list(dims.get(key_map.recovery, [])) or ["RRG", "HEX"], dtype=object),
+        "sizes": np.asarray([f"S{i:02d}" for i in range(1, n_sizes + 1)], dtype=object),
+        # Existing image files are reused so synthetic rows still render in the app
+        "logos": np.asarray([logos[i % len(logos)] for i in range(len(brands))], dtype=object),
+        "photos": np.asarray([photos[i % len(photos)] for i in range(len(units))], dtype=object),
+    }
+
+
+def generate(schema, n_rows, dimensions=None, column_factor=1, size_step=0.35, jitter=0.05, seed=0):
+    # One synthetic catalogue frame of n_rows, generated column by column with numpy.
+    # Every generated row copies all its parameters from one source row, so values that
+    # belong together (Minimum/Maximum airflow, the points of an outline) stay together.
+    # Size-dependent ones are then multiplied by the row's (1 + size_step * size index)
+    # (squared for areas/airflow/power) and jitter, which keeps them consistent
+    rng = np.random.default_rng(seed)
+    dims = dimensions or build_dimensions(schema)
+    key_map = schema.key_map
+
+    brand_idx = rng.integers(len(dims["brands"]), size=n_rows)
+    unit_idx = rng.integers(len(dims["units"]), size=n_rows)
+    size_idx = rng.integers(len(dims["sizes"]), size=n_rows)
+    source = rng.integers(schema.rows, size=n_rows) if schema.rows else None
+    factor = (1.0 + size_step * size_idx) * rng.normal(1.0, jitter, size=n_rows).clip(1 - 3 * jitter, 1 + 3 * jitter)
+
+    keys = {
+        key_map.year: dims["years"][rng.integers(len(dims["years"]), size=n_rows)],
+        key_map.quarter: dims["quarters"][rng.integers(len(dims["quarters"]), size=n_rows)],
+        key_map.region: dims["regions"][rng.integers(len(dims["regions"]), size=n_rows)],
+        key_map.brand: dims["brands"][brand_idx],
+        key_map.logo: dims["logos"][brand_idx],
+        key_map.unit_name: dims["units"][unit_idx],
+        key_map.unit_photo: dims["photos"][unit_idx],
+        key_map.recovery: dims["recoveries"][rng.integers(len(dims["recoveries"]), size=n_rows)],
+        key_map.size: dims["sizes"][size_idx],
+    }
+
+    data = {}
+    for col in schema.columns:
+        profile = schema.profiles[col]
+        if col in keys:
+            data[col] = keys[col]
+            continue
+        if source is None:
+            values = np.full(n_rows, np.nan if profile.kind == "numeric" else None)
+        else:
+            values = profile.values[source] # Missing cells stay missing with their row
+        if profile.kind == "numeric":
+            if profile.scaling:
+                values = values * factor ** profile.scaling
+            if profile.integer:
+                values = np.round(values)
+        data[col] = values
+
+    frame = pd.DataFrame(data, columns=schema.columns)
+    for col, profile in schema.profiles.items():
+        if profile.kind == "numeric" and profile.integer and not frame[col].isna().any():
+            frame[col] = frame[col].astype(np.int64)
+
+    if column_factor > 1:
+        # Wider catalogues: repeat the technical parameters under numbered names
+        fixed = set(key_map.excluded_cols)
+        parameters = [col for col in schema.columns if col not in fixed]
+        extra = [frame[parameters].set_axis([f"{col} #{copy}" for col in parameters], axis=1)
+                 for copy in range(1, column_factor)]
+        frame = pd.concat([frame] + extra, axis=1)
+    return frame
+
+
+def write_parquet(schema, path, n_rows, chunk_rows=250_000, **options):
+    # Stream millions of rows to one Parquet file chunk by chunk to bound memory
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    dims = options.pop("dimensions", None) or build_dimensions(schema)
+    seed = options.pop("seed", 0)
+    writer = None
+    try:
+        for chunk, start in enumerate(range(0, n_rows, chunk_rows)):
+            frame = generate(schema, min(chunk_rows, n_rows - start), dims, seed=seed + chunk, **options)
+            table = pa.Table.from_pandas(data_cache.make_arrow_safe(frame), preserve_index=False,
+                                         schema=writer.schema if writer else None)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_workbook(schema, path, n_rows, sheet_name="data", **options):
+    # Excel output for loader tests; limited to one sheet's worth of rows
+    if n_rows > EXCEL_MAX_ROWS:
+        raise ValueError(f"{n_rows} rows do not fit in one Excel sheet (max {EXCEL_MAX_ROWS}); use Parquet")
+    generate(schema, n_rows, **options).to_excel(path, sheet_name=sheet_name, index=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic AHU catalogues with the schema of a workbook.")
+    parser.add_argument("--source", default="Data_2025.xlsx", help="Workbook whose schema and values are profiled")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--out", default=os.path.join("synthetic", "catalog"), help="Output path without extension")
+    parser.add_argument("--format", nargs="+", choices=["parquet", "xlsx"], default=["parquet"])
+    parser.add_argument("--column-factor", type=int, default=1, help="Repeat the technical parameters N times")
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--regions", type=int, default=6)
+    parser.add_argument("--brands", type=int, default=12)
+    parser.add_argument("--units", type=int, default=8, help="Unit families per catalogue")
+    parser.add_argument("--sizes", type=int, default=10, help="Unit sizes per family")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    schema = CatalogSchema.from_workbook(args.source)
+    dimensions = build_dimensions(schema, args.years, args.regions, args.brands, args.units, args.sizes)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    for fmt in args.format:
+        start = time.perf_counter()
+        path = f"{args.out}.{fmt}"
+        if fmt == "parquet":
+            write_parquet(schema, path, args.rows, dimensions=dimensions, column_factor=args.column_factor, seed=args.seed)
+        else:
+            write_workbook(schema, path, args.rows, dimensions=dimensions, column_factor=args.column_factor, seed=args.seed)
+        print(f"Wrote {path}: {args.rows} rows in {time.perf_counter() - start:.1f} s "
+              f"({os.path.getsize(path) / (1024 * 1024):.1f} MB)")
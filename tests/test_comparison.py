@@ -0,0 +1,27 @@
+import pandas as pd
+import pytest
+
+import comparison
+
+
+@pytest.mark.parametrize("value, text", [
+    (28400.0, "+28400"),
+    (-1600.4, "-1600"),
+    (100.0, "+100"),
+    (12.345, "+12.3"),
+    (-10.0, "-10"),
+    (0.75, "+0.75"),
+    (-0.5, "-0.5"),
+    (0.001234, "+0.0012"),
+])
+def test_signed_fixed(value, text):
+    assert comparison.signed_fixed([value]).tolist() == [text]
+
+
+def test_large_differences_are_not_scientific():
+    table = pd.DataFrame({"A": [1600.0], "B": [30000.0]}, index=pd.Index(["Maximum airflow"], name="Parameter"))
+    rows = pd.DataFrame({"Maximum airflow": [1600.0, 30000.0]})
+    differences = comparison.parameter_differences(rows, ["Maximum airflow"], ["A", "B"])
+    shown = comparison.style_comparison(table, differences).data
+    assert shown.loc["Maximum airflow", "B"] == "30000.0 (+28400, +1775.0%)"
+    assert shown.loc["Maximum airflow", "A"] == "1600.0"
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import comparison_engine
+
+KEY_COLS = ["Year", "Quarter", "Region", "Brand name", "Unit name", "Recovery type", "Unit size"]
+
+
+def catalogue(rng, n):
+    # Random rows over few distinct values, so keys repeat and share prefixes
+    df = pd.DataFrame({
+        "Year": rng.choice([2024, 2025], n),
+        "Quarter": rng.choice(["Q1", "Q2"], n),
+        "Region": rng.choice(["EU", "UK"], n),
+        "Brand name": rng.choice(["A", "B", "C"], n),
+        "Brand logo": "logo.png",
+        "Unit name": rng.choice(["U1", "U2", "U3"], n),
+        "Recovery type": rng.choice(["Rotary", "Plate"], n),
+        "Unit size": rng.choice([1.0, 2.0, 3.0, 4.0], n),
+        "Minimum airflow": rng.uniform(100, 500, n).round(),
+        "Maximum airflow": rng.uniform(600, 2000, n).round(),
+    })
+    # Rectangular outlines (points 1-4), some without coordinates
+    width, height = rng.integers(500, 3000, n).astype(float), rng.integers(500, 2500, n).astype(float)
+    for i, (x, y) in enumerate([(0, 0), (0, height), (width, height), (width, 0)], start=1):
+        df[f"x{i}"], df[f"y{i}"] = x, y
+    df.loc[rng.random(n) < 0.05, "x2"] = np.nan
+    df.loc[rng.random(n) < 0.05, "Region"] = None # Rows that can't be selected
+    return df
+
+
+def tree_nodes(node, prefix=()):
+    values, children = node
+    yield prefix, values
+    for value in values:
+        yield from tree_nodes(children[value], prefix + (value,))
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_patched_indexes_match_a_fresh_build(seed):
+    rng = np.random.default_rng(seed)
+    old = catalogue(rng, 300)
+    # Remove some rows, change some, append new ones and shuffle part of the order
+    new = old.drop(index=rng.choice(len(old), 40, replace=False))
+    changed = rng.choice(len(new), 20, replace=False)
+    new.iloc[changed, new.columns.get_loc("Maximum airflow")] += 10
+    new = pd.concat([new, catalogue(rng, 30)], ignore_index=True)
+    if seed % 2:
+        new = new.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+    engine = comparison_engine.ComparisonEngine(old)
+    diff = comparison_engine.diff_frames(old, new, engine.columns.key_cols)
+    patched = engine.patched(new, diff)
+    fresh = comparison_engine.ComparisonEngine(new)
+
+    assert set(patched.selection_index.keys()) == set(fresh.selection_index.keys())
+    for key in fresh.selection_index.keys():
+        assert patched.selection_index.positions(key).tolist() == fresh.selection_index.positions(key).tolist()
+    assert list(tree_nodes(patched.option_tree._root)) == list(tree_nodes(fresh.option_tree._root))
+    assert patched.covering_airflow(800.0) == fresh.covering_airflow(800.0)
+    # The old engine is left as it was
+    assert list(tree_nodes(engine.option_tree._root)) == list(tree_nodes(comparison_engine.ComparisonEngine(old).option_tree._root))
+
+
+def test_period_engines_match_one_engine_over_all_rows():
+    rng = np.random.default_rng(7)
+    df = catalogue(rng, 400)
+    df = df[df["Region"].notna()].reset_index(drop=True)
+    periods = [(2024, "Q1"), (2025, "Q2")]
+    parts = [df[(df["Year"] == year) & (df["Quarter"] == quarter)].reset_index(drop=True) for year, quarter in periods]
+    combined = comparison_engine.PeriodEngines([(period, comparison_engine.ComparisonEngine(part))
+                                                for period, part in zip(periods, parts)])
+    whole = comparison_engine.ComparisonEngine(pd.concat(parts, ignore_index=True))
+
+    keys = [list(whole.selection_index.keys())[i] for i in rng.choice(len(whole.selection_index), 6, replace=False)]
+    keys = [tuple(value.item() if isinstance(value, np.generic) else value for value in key) for key in keys]
+    mine, theirs = combined.resolve(keys), whole.resolve(keys)
+    assert mine.found == theirs.found and mine.labels == theirs.labels
+    assert mine.positions.tolist() == theirs.positions.tolist() # Positions count through the periods in order
+    pd.testing.assert_frame_equal(combined.comparison_table(mine), whole.comparison_table(theirs))
+    pd.testing.assert_frame_equal(combined.chart_frame(mine)[0], whole.chart_frame(theirs)[0])
+    assert combined.drawable_labels(mine) == whole.drawable_labels(theirs)
+    assert combined.unit_photo(mine) == whole.unit_photo(theirs)
+    for trace, expected in zip(combined.overlay_figure(mine).data, whole.overlay_figure(theirs).data):
+        np.testing.assert_array_equal(np.asarray(trace.x, dtype=float), np.asarray(expected.x, dtype=float))
+        assert list(trace.text) == list(expected.text)
+
+    # A period outside the set is not found
+    assert combined.resolve([(2030, "Q1") + keys[0][2:]]).found == [False]
@@ -0,0 +1,75 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+import data_cache
+import dataset_store
+
+
+def write_workbook(path, rows):
+    df = pd.DataFrame({
+        "Year": 2025, "Quarter": ["Q1", "Q2"] * (rows // 2), "Region": "EU",
+        "Brand name": np.tile(["A", "B", "C"], rows)[:rows], "Unit name": "U1", "Recovery type": "RRG",
+        "Unit size": [f"S{i:02d}" for i in range(rows)],
+        "Minimum airflow": 400.0, "Maximum airflow": np.linspace(1000, 5000, rows),
+        "x1": 0.0, "y1": 0.0, "x2": 0.0, "y2": 900.0, "x3": 1200.0, "y3": 900.0, "x4": 1200.0, "y4": 0.0,
+    })
+    df.to_excel(path, sheet_name="data", index=False)
+    # Distinct mtimes for back-to-back writes within one test
+    os.utime(path, (os.path.getmtime(path) + rows, os.path.getmtime(path) + rows))
+
+
+def open_store(tmp_path, rows=20):
+    path = str(tmp_path / "Data_2025.xlsx")
+    write_workbook(path, rows)
+    return dataset_store.DatasetStore.from_pattern(str(tmp_path / "Data_*.xlsx"), cache_dir=str(tmp_path / "cache")), path
+
+
+def test_one_engine_per_period(tmp_path):
+    store, _ = open_store(tmp_path)
+    view = store.view()
+    q1, q2 = view.engine([(2025, "Q1")]), view.engine([(2025, "Q2")])
+    both = view.engine([(2025, "Q1"), (2025, "Q2")])
+    assert both.engines == (q1, q2)
+    # The combination is not cached or counted again
+    assert store.stats()["loaded"] == [[(2025, "Q1")], [(2025, "Q2")]]
+    assert store.stats()["bytes"] == store._engine_bytes(q1) + store._engine_bytes(q2)
+
+
+def test_reload_does_not_block_views(tmp_path):
+    store, path = open_store(tmp_path)
+    before = store.view()
+    q1 = before.engine([(2025, "Q1")])
+    write_workbook(path, 18)
+
+    # Hold the reload in its parse step and use the store from another thread meanwhile
+    parsing, release = threading.Event(), threading.Event()
+    load_manifest = store._load_manifest
+
+    def slow_load_manifest(*args):
+        parsing.set()
+        release.wait(10)
+        return load_manifest(*args)
+
+    store._load_manifest = slow_load_manifest
+    reload = threading.Thread(target=store._reload, args=(path, data_cache.file_version(path)))
+    reload.start()
+    try:
+        assert parsing.wait(10)
+        during = {}
+        reader = threading.Thread(target=lambda: during.update(view=store.view(), q2=store.view().engine([(2025, "Q2")])))
+        reader.start()
+        reader.join(5)
+        assert not reader.is_alive(), "store.view() waited for the reload"
+        assert during["view"].generation == 0
+    finally:
+        release.set()
+        reload.join(10)
+
+    after = store.view()
+    assert after.generation == 1
+    assert len(after.engine([(2025, "Q1")]).df) == 9 and len(after.engine([(2025, "Q2")]).df) == 9
+    # Views taken earlier keep the rows they started with
+    assert before.engine([(2025, "Q1")]) is q1 and len(during["q2"].df) == 10
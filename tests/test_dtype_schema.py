@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import dtype_schema
+
+
+@pytest.mark.parametrize("text, expected", [
+    # A lone comma is a decimal comma, also before exactly three digits
+    ("0,6", 0.6),
+    ("1,5", 1.5),
+    ("0,600", 0.6),
+    ("2,250", 2.25),
+    ("2,250 kW", 2.25),
+    ("1,600", 1.6),
+    # Several groups, or a comma together with a dot, group digits
+    ("1,600,000", 1600000.0),
+    ("1.600.000", 1600000.0),
+    ("1,600.5", 1600.5),
+    ("1.600,5", 1600.5),
+    # Spaces between digit groups, units and plain decimals
+    ("1 600", 1600.0),
+    ("1 600 m³/h", 1600.0),
+    ("0.6", 0.6),
+    ("-12,5", -12.5),
+    ("420", 420.0),
+])
+def test_number_text(text, expected):
+    assert dtype_schema.parse_numbers(pd.Series([text])).iloc[0] == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("text", [
+    "0,600.5", # An integer part of 0 is never grouped
+    "0.600,5",
+    "1,2,3", # Groups must have three digits
+    "12,34.5",
+    "1.600.5",
+    "YES",
+    "",
+])
+def test_number_text_rejected(text):
+    assert np.isnan(dtype_schema.parse_numbers(pd.Series([text])).iloc[0])
+
+
+def test_parse_numbers_keeps_numeric_columns():
+    series = pd.Series([1, 2, None], dtype=float)
+    pd.testing.assert_series_equal(dtype_schema.parse_numbers(series), series)
+
+
+def test_parse_ranges():
+    low, high = dtype_schema.parse_ranges(pd.Series(["420-1600", "0,6 - 1,2", "1 000 to 2 000", 900, None]))
+    np.testing.assert_allclose(low, [420, 0.6, 1000, 900, np.nan])
+    np.testing.assert_allclose(high, [1600, 1.2, 2000, 900, np.nan])
+
+
+def test_normalize_frame_decimal_comma_column():
+    df = pd.DataFrame({"Motor rated power": ["2,250", "0,6", "1,5"]})
+    normalized = dtype_schema.normalize_frame(df)
+    np.testing.assert_allclose(normalized["Motor rated power"], [2.25, 0.6, 1.5])
+
+
+def test_numeric_category_keeps_numbers():
+    # "Unit size" is a category column; numeric sizes must not turn into "10.0"-style text
+    df = pd.DataFrame({"Unit size": [9.0, 10.0, np.nan, 10.0]})
+    normalized = dtype_schema.normalize_frame(df)
+    column = normalized["Unit size"]
+    assert isinstance(column.dtype, pd.CategoricalDtype)
+    assert list(column.cat.categories) == [9.0, 10.0]
+    assert column.isna().tolist() == [False, False, True, False]
+
+
+def test_mixed_category_is_text():
+    df = pd.DataFrame({"Type": pd.Series(["NH.RRG", "Total", 0, None, "Total"], dtype=object)})
+    column = dtype_schema.normalize_frame(df)["Type"]
+    assert sorted(column.cat.categories) == ["0", "NH.RRG", "Total"]
+    assert column.isna().tolist() == [False, False, False, True, False]
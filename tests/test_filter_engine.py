@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+import filter_engine
+
+
+def brute_force(lows, highs, point):
+    # Reference answer: scan every range (swapped bounds count as the same range, missing ones never match)
+    low, high = np.minimum(lows, highs), np.maximum(lows, highs)
+    return np.flatnonzero((low <= point) & (point <= high))
+
+
+@pytest.mark.parametrize("n", [1, 2, 10, 300, 3000])
+def test_interval_index_matches_brute_force(n):
+    rng = np.random.default_rng(n)
+    # Integer bounds on a small range, so many ranges share endpoints with each other and the queries
+    lows = rng.integers(0, 100, n).astype(float)
+    highs = lows + rng.integers(0, 40, n)
+    swapped = rng.random(n) < 0.1
+    lows[swapped], highs[swapped] = highs[swapped], lows[swapped].copy()
+    lows[rng.random(n) < 0.05] = np.nan
+    highs[rng.random(n) < 0.05] = np.nan
+    index = filter_engine.IntervalIndex(lows, highs)
+    assert len(index) == int((~np.isnan(lows) & ~np.isnan(highs)).sum())
+    for point in np.concatenate([np.arange(-5.0, 146.0), rng.uniform(-5, 145, 50)]):
+        assert index.covering(point).tolist() == brute_force(lows, highs, point).tolist(), point
+
+
+def test_interval_index_point_ranges():
+    # Zero-width ranges match only their own value
+    index = filter_engine.IntervalIndex([5.0, 5.0, 7.0], [5.0, 5.0, 7.0])
+    assert index.covering(5.0).tolist() == [0, 1]
+    assert index.covering(6.0).tolist() == []
+    assert index.covering(7.0).tolist() == [2]
+
+
+@pytest.mark.parametrize("lows, highs", [([], []), ([np.nan, 1.0], [2.0, np.nan])])
+def test_interval_index_empty(lows, highs):
+    index = filter_engine.IntervalIndex(lows, highs)
+    assert len(index) == 0
+    assert index.covering(1.5).tolist() == []
@@ -0,0 +1,28 @@
+import io
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+
+import comparison_engine
+import footprint_render
+
+
+def test_render_without_outlines_gives_an_empty_chart():
+    renderer = footprint_render.FootprintRenderer(width=320, height=200)
+    png = renderer.render(np.empty((0, 15)), np.empty((0, 15)), [])
+    assert Image.open(io.BytesIO(png)).size == (320, 200)
+    svg = renderer.render(np.full((1, 15), np.nan), np.full((1, 15), np.nan), ["A"], fmt="svg")
+    assert svg.startswith(b"<svg") and b"<path" not in svg
+
+
+def test_engine_footprint_image_without_coordinates():
+    # A selected unit without outline coordinates: the engine's image is an empty chart, not an error
+    df = pd.DataFrame({
+        "Year": [2025], "Quarter": ["Q1"], "Region": ["EU"], "Brand name": ["A"], "Unit name": ["U1"],
+        "Recovery type": ["RRG"], "Unit size": ["S1"], "x1": [np.nan], "y1": [np.nan], "x2": [np.nan], "y2": [np.nan],
+    })
+    engine = comparison_engine.ComparisonEngine(df)
+    resolved = engine.resolve([(2025, "Q1", "EU", "A", "U1", "RRG", "S1")])
+    assert engine.drawable_labels(resolved) == ([], ["A"])
+    Image.open(io.BytesIO(engine.footprint_image(resolved))).verify()
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import comparison_engine
+import similarity
+
+
+def brute_force(data, point, k, allowed=None):
+    # Reference answer: every allowed row's distance, sorted (row index breaks ties)
+    rows = np.arange(len(data)) if allowed is None else np.flatnonzero(allowed)
+    distances = np.sqrt(((data[rows] - point) ** 2).sum(axis=1))
+    order = np.lexsort((rows, distances))[:k]
+    return distances[order], rows[order]
+
+
+@pytest.mark.parametrize("n, dims, leaf_size", [(0, 3, 4), (1, 2, 4), (50, 2, 4), (500, 3, 8), (2000, 6, 32)])
+def test_kdtree_matches_brute_force(n, dims, leaf_size):
+    rng = np.random.default_rng(n + dims)
+    data = rng.normal(size=(n, dims))
+    tree = similarity.KDTree(data, leaf_size=leaf_size)
+    for _ in range(20):
+        point = rng.normal(size=dims)
+        k = int(rng.integers(1, 12))
+        allowed = rng.random(n) < 0.5
+        for mask in (None, allowed):
+            distances, rows = tree.query(point, k, mask)
+            expected_d, expected_rows = brute_force(data, point, k, mask)
+            # Random normal points have no ties, so the rows must match in order too
+            np.testing.assert_allclose(distances, expected_d)
+            assert rows.tolist() == expected_rows.tolist()
+
+
+def test_kdtree_duplicate_points():
+    # Many identical rows: every one of them is at distance 0
+    data = np.zeros((100, 2))
+    distances, rows = similarity.KDTree(data, leaf_size=4).query([0.0, 0.0], k=10)
+    assert len(rows) == 10 and len(set(rows.tolist())) == 10
+    assert not distances.any()
+
+
+def test_kdtree_nothing_allowed():
+    data = np.arange(20, dtype=float).reshape(10, 2)
+    distances, rows = similarity.KDTree(data, leaf_size=2).query([0.0, 0.0], k=3, allowed=np.zeros(10, dtype=bool))
+    assert not len(distances) and not len(rows)
+
+
+def test_features_follow_split_airflow_columns():
+    # Range cells split by dtype_schema rename the airflow columns; they are still compared on
+    df = pd.DataFrame({
+        "Year": [2025, 2025], "Quarter": ["Q1", "Q1"], "Region": ["EU", "EU"], "Brand name": ["A", "B"],
+        "Unit name": ["U1", "U2"], "Recovery type": ["R", "R"], "Unit size": ["1", "2"],
+        "Minimum airflow (min)": [400.0, 500.0], "Maximum airflow (max)": [1600.0, 1800.0],
+        "Motor rated power": [1.5, 2.0],
+    })
+    features = comparison_engine.ComparisonEngine(df).similarity.features
+    assert features == ["Maximum airflow (max)", "Minimum airflow (min)", "Motor rated power"]
+
+
+def test_repeated_columns_use_the_non_zero_value():
+    # HEX units carry their efficiency in the repeated column, with 0 in the first one
+    df = pd.DataFrame({
+        "Efficiency at nominal balanced airflows": [75.0, 0.0, 0.0, np.nan],
+        "Efficiency at nominal balanced airflows.1": [0.0, 82.0, 0.0, 80.0],
+    })
+    values = similarity.feature_values(df, "Efficiency at nominal balanced airflows")
+    assert values.tolist() == [75.0, 82.0, 0.0, 80.0]
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+import synthetic_catalog
+
+
+def source_frame(n=40, seed=0):
+    # Rectangular outlines and airflow ranges that differ from row to row
+    rng = np.random.default_rng(seed)
+    width = rng.integers(500, 3000, n)
+    height = rng.integers(500, 2500, n)
+    minimum = rng.integers(200, 800, n)
+    return pd.DataFrame({
+        "Year": 2025, "Quarter": "Q1", "Region": "EU", "Brand name": rng.choice(["A", "B"], n),
+        "Unit name": "U1", "Recovery type": rng.choice(["RRG", "HEX"], n), "Unit size": np.arange(n),
+        "Minimum airflow": minimum, "Maximum airflow": minimum + rng.integers(100, 3000, n),
+        "Motor rated power": np.where(rng.random(n) < 0.2, np.nan, rng.uniform(0.5, 5.0, n)),
+        "x1": 5, "y1": 5, "x2": 5, "y2": height, "x3": width, "y3": height, "x4": width, "y4": 5,
+    })
+
+
+def test_rows_keep_their_parameters_together():
+    source = source_frame()
+    frame = synthetic_catalog.generate(synthetic_catalog.CatalogSchema.from_frame(source), 2000)
+    assert (frame["Minimum airflow"] <= frame["Maximum airflow"]).all()
+    # Outlines are still rectangles: scaled points of one source row
+    assert (frame["x1"] == frame["x2"]).all() and (frame["x3"] == frame["x4"]).all()
+    assert (frame["y2"] == frame["y3"]).all() and (frame["y1"] == frame["y4"]).all()
+    # Missing cells come with their row, at about the source's rate
+    assert 0.1 < frame["Motor rated power"].isna().mean() < 0.3
+
+
+def test_parameters_follow_the_source_rows():
+    source = source_frame()
+    frame = synthetic_catalog.generate(synthetic_catalog.CatalogSchema.from_frame(source), 500, jitter=0.0, size_step=0.0)
+    # Without size scaling every generated row is one of the source rows' parameter sets
+    columns = ["Minimum airflow", "Maximum airflow", "x3", "y2"]
+    rows = set(source[columns].itertuples(index=False, name=None))
+    assert set(frame[columns].itertuples(index=False, name=None)) <= rows